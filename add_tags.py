@@ -1,59 +1,167 @@
 import json
 import ollama
 import time
-from typing import List
+import asyncio
+import argparse
+from typing import Dict, List, Optional, Tuple
 import sys
+from binary_corpus import binary_path_for, write_binary_corpus
+from llm_cache import DEFAULT_CACHE_PATH, LLMCache
+from checkpoint import Journal, journal_path_for
+from manifest import Manifest, inputs_hash
+from fast_tagger import (MODEL_PATH as FAST_MODEL_PATH, TAG_SOURCE as FAST_TAG_SOURCE,
+                         TARGET_PRECISION as FAST_TARGET_PRECISION, get_tagger)
+from text_chunks import chunk_spans
 
-def get_tags(text: str, paper_num: int) -> List[str]:
-    """Get standardized topic tags using Ollama."""
-    prompt = f"""
+MODEL = 'llama3.3:70b-instruct-q2_K'
+
+# Passage tagging (--passages): passage length, passages per model request, and the
+# share of a paper's text a tag must cover to become a paper-level tag
+PASSAGE_CHARS = 1000
+PASSAGES_PER_REQUEST = 8
+MIN_TAG_WEIGHT = 0.2
+
+# The tag vocabulary, in the order the prompts list it
+TAG_VOCABULARY = [
+    "Federal Power", "State Rights", "Judiciary", "Executive Power",
+    "Legislative Power", "Military", "Foreign Relations", "Commerce",
+    "Taxation", "Individual Rights", "Constitutional Structure",
+    "Democracy", "Republic", "Checks and Balances", "Federal System"
+]
+VALID_TAGS = set(TAG_VOCABULARY)
+# Filled into the {tag_list} field of every prompt template
+TAG_LIST = '\n'.join(f"    - {tag}" for tag in TAG_VOCABULARY)
+
+TAGS_PROMPT_TEMPLATE = """
     Read this excerpt from Federalist Paper #{paper_num} and provide 3-5 topic tags.
     Use only standardized tags from this list:
-    - Federal Power
-    - State Rights
-    - Judiciary
-    - Executive Power
-    - Legislative Power
-    - Military
-    - Foreign Relations
-    - Commerce
-    - Taxation
-    - Individual Rights
-    - Constitutional Structure
-    - Democracy
-    - Republic
-    - Checks and Balances
-    - Federal System
-    
-    Text: {text[:1000]}...
+{tag_list}
+    
+    Text: {excerpt}...
     
     Return only the relevant tags as a comma-separated list, no other text.
+    """.replace('{tag_list}', TAG_LIST)
+
+BATCH_TAGS_PROMPT_TEMPLATE = """
+    Read these excerpts from the Federalist Papers and provide 3-5 topic tags for each paper.
+    Use only standardized tags from this list:
+{tag_list}
+    
+    {excerpts}
+    
+    Return only a JSON object that maps each paper number to a list of its tags,
+    for example {{"10": ["Democracy", "Republic"]}}, no other text.
+    """.replace('{tag_list}', TAG_LIST)
+
+PASSAGE_TAGS_PROMPT_TEMPLATE = """
+    Read these consecutive passages from Federalist Paper #{paper_num} and provide 1-3 topic tags for each passage.
+    Use only standardized tags from this list:
+{tag_list}
+    
+    {passages}
+    
+    Return only a JSON object that maps each passage number to a list of its tags,
+    for example {{"1": ["Democracy", "Republic"]}}, no other text.
+    """.replace('{tag_list}', TAG_LIST)
+
+def build_tags_prompt(text: str, paper_num: int) -> str:
+    """Build the tagging prompt for the start of a paper."""
+    return TAGS_PROMPT_TEMPLATE.format(paper_num=paper_num, excerpt=text[:1000])
+
+def batch_excerpts(papers: List[Dict]) -> List[List]:
+    """The (paper number, excerpt) pairs that fill a batch prompt."""
+    return [[paper['number'], paper['text'][:1000]] for paper in papers]
+
+def build_batch_prompt(papers: List[Dict]) -> str:
+    """Build one tagging prompt that covers the start of several papers."""
+    excerpts = '\n\n    '.join(f"Federalist Paper #{number}: {excerpt}..."
+                                for number, excerpt in batch_excerpts(papers))
+    return BATCH_TAGS_PROMPT_TEMPLATE.format(excerpts=excerpts)
+
+def parse_batch_tags(response_text: str) -> Dict[int, List[str]]:
+    """
+    Parse a JSON batch response into tags per paper number. Papers that are
+    missing or malformed in the response are left out.
+    """
+    try:
+        data = json.loads(response_text)
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    
+    batch_tags = {}
+    for key, value in data.items():
+        try:
+            number = int(str(key).lstrip('#'))
+        except ValueError:
+            continue
+        if isinstance(value, str):
+            batch_tags[number] = parse_tags(value)
+        elif isinstance(value, list) and all(isinstance(tag, str) for tag in value):
+            batch_tags[number] = parse_tags(','.join(value))
+    return batch_tags
+
+def build_passage_prompt(paper_num: int, passages: List[List]) -> str:
+    """Build one tagging prompt for several (passage number, text) pairs of a paper."""
+    text = '\n\n    '.join(f"Passage #{index}: {passage}" for index, passage in passages)
+    return PASSAGE_TAGS_PROMPT_TEMPLATE.format(paper_num=paper_num, passages=text)
+
+def aggregate_passage_tags(spans: List, passage_tags: List[List[str]]) -> Dict[str, float]:
+    """
+    Weight each tag by the share of the paper's characters in the passages
+    that carry it, heaviest first.
     """
+    total = sum(end - start for start, end in spans) or 1
+    weights: Dict[str, float] = {}
+    for (start, end), tags in zip(spans, passage_tags):
+        for tag in tags:
+            weights[tag] = weights.get(tag, 0.0) + (end - start) / total
+    return dict(sorted(weights.items(), key=lambda x: x[1], reverse=True))
+
+def paper_tags_from_weights(weights: Dict[str, float]) -> List[str]:
+    """The 3-5 heaviest tags: every tag over MIN_TAG_WEIGHT, topped up to 3."""
+    ranked = list(weights)
+    heavy = [tag for tag in ranked if weights[tag] >= MIN_TAG_WEIGHT]
+    return ranked[:max(len(heavy), 3)][:5]
+
+def parse_tags(response_text: str) -> List[str]:
+    """Split a comma-separated model response into at most 5 valid tags."""
+    tags = [tag.strip() for tag in response_text.split(',')]
+    
+    # Remove any tags not in our standardized list
+    tags = [tag for tag in tags if tag in VALID_TAGS]
+    
+    return tags[:5]  # Return at most 5 tags
+
+def get_tags(text: str, paper_num: int, client=None, cache: Optional[LLMCache] = None) -> List[str]:
+    """Get standardized topic tags using Ollama."""
+    prompt = build_tags_prompt(text, paper_num)
+    
+    if cache is not None:
+        cached = cache.get(MODEL, TAGS_PROMPT_TEMPLATE, paper_num, text[:1000])
+        if cached is not None:
+            print(f"\nUsing cached response for paper #{paper_num}")
+            return parse_tags(cached)
     
     try:
         print(f"\nSending request to Ollama for paper #{paper_num}...")
-        response = ollama.generate(
-            model='llama3.3:70b-instruct-q2_K',
+        response = (client or ollama).generate(
+            model=MODEL,
             prompt=prompt
         )
         
         print(f"Raw response: {response['response']}")
+        if cache is not None:
+            cache.put(response['response'], MODEL, TAGS_PROMPT_TEMPLATE, paper_num, text[:1000])
         
         # Split response into tags and clean them up
-        tags = [tag.strip() for tag in response['response'].split(',')]
-        print(f"Split tags: {tags}")
+        print(f"Split tags: {[tag.strip() for tag in response['response'].split(',')]}")
         
-        # Remove any tags not in our standardized list
-        valid_tags = {
-            "Federal Power", "State Rights", "Judiciary", "Executive Power",
-            "Legislative Power", "Military", "Foreign Relations", "Commerce",
-            "Taxation", "Individual Rights", "Constitutional Structure",
-            "Democracy", "Republic", "Checks and Balances", "Federal System"
-        }
-        tags = [tag for tag in tags if tag in valid_tags]
+        tags = parse_tags(response['response'])
         print(f"Valid tags: {tags}")
         
-        return tags[:5]  # Return at most 5 tags
+        return tags
         
     except Exception as e:
         print(f"\nError details for paper #{paper_num}:")
@@ -61,17 +169,266 @@ def get_tags(text: str, paper_num: int) -> List[str]:
         print(f"Message: {str(e)}")
         return []
 
+class AdaptiveBackoff:
+    """
+    Delay shared by all concurrent requests. It stays at zero while requests
+    succeed, doubles on every error and halves again on each success.
+    """
+    
+    def __init__(self, initial: float = 1.0, maximum: float = 60.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.delay = 0.0
+    
+    def failed(self):
+        self.delay = min(self.maximum, max(self.initial, self.delay * 2))
+    
+    def succeeded(self):
+        self.delay = self.delay / 2 if self.delay > self.initial else 0.0
+
+class AsyncTagger:
+    """Concurrency limit, shared backoff and call counter for async requests."""
+    
+    def __init__(self, client: ollama.AsyncClient, concurrency: int,
+                 cache: Optional[LLMCache] = None, max_retries: int = 3):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.backoff = AdaptiveBackoff()
+        self.cache = cache
+        self.max_retries = max_retries
+        self.calls = 0
+    
+    async def generate(self, prompt: str, label: str, **options) -> Optional[str]:
+        """Call the model with retries, returning None if every attempt fails."""
+        for attempt in range(self.max_retries):
+            if self.backoff.delay:
+                await asyncio.sleep(self.backoff.delay)
+            try:
+                async with self.semaphore:
+                    self.calls += 1
+                    response = await self.client.generate(model=MODEL, prompt=prompt, **options)
+                self.backoff.succeeded()
+                return response['response']
+            except Exception as e:
+                self.backoff.failed()
+                print(f"Attempt {attempt + 1} for {label} failed: {type(e).__name__}: {e}")
+        
+        print(f"Giving up on {label} after {self.max_retries} attempts")
+        return None
+
+async def get_tags_async(tagger: AsyncTagger, text: str, paper_num: int) -> List[str]:
+    """Get topic tags for one paper, holding one of the concurrency slots."""
+    cache = tagger.cache
+    if cache is not None:
+        cached = cache.get(MODEL, TAGS_PROMPT_TEMPLATE, paper_num, text[:1000])
+        if cached is not None:
+            return parse_tags(cached)
+    
+    response = await tagger.generate(build_tags_prompt(text, paper_num), f"paper #{paper_num}")
+    if response is None:
+        return []
+    if cache is not None:
+        cache.put(response, MODEL, TAGS_PROMPT_TEMPLATE, paper_num, text[:1000])
+    return parse_tags(response)
+
+async def get_tags_batch_async(tagger: AsyncTagger, papers: List[Dict]) -> List[List[str]]:
+    """
+    Tag several papers with one JSON-formatted request. Papers missing from
+    or malformed in the response are retried one at a time.
+    """
+    excerpts = batch_excerpts(papers)
+    cache = tagger.cache
+    response = cache.get(MODEL, BATCH_TAGS_PROMPT_TEMPLATE, excerpts) if cache is not None else None
+    if response is None:
+        label = f"papers #{papers[0]['number']}-#{papers[-1]['number']}"
+        response = await tagger.generate(build_batch_prompt(papers), label, format='json')
+        if response is not None and cache is not None and parse_batch_tags(response):
+            cache.put(response, MODEL, BATCH_TAGS_PROMPT_TEMPLATE, excerpts)
+    
+    batch_tags = parse_batch_tags(response) if response is not None else {}
+    missing = [paper for paper in papers if paper['number'] not in batch_tags]
+    if missing:
+        print(f"Retrying {len(missing)} papers individually: {[paper['number'] for paper in missing]}")
+        retried = await asyncio.gather(*(get_tags_async(tagger, paper['text'], paper['number'])
+                                         for paper in missing))
+        batch_tags.update({paper['number']: tags for paper, tags in zip(missing, retried)})
+    return [batch_tags[paper['number']] for paper in papers]
+
+async def tag_papers_async(papers: List[Dict], concurrency: int, host: Optional[str] = None,
+                           cache: Optional[LLMCache] = None, journal: Optional[Journal] = None,
+                           batch_size: int = 1) -> List[List[str]]:
+    """
+    Tag all papers with at most `concurrency` requests in flight, keeping input order.
+    With batch_size > 1, each request covers that many papers.
+    Each tagged paper is appended to the journal as soon as it completes;
+    papers left without tags are journaled as failed and retried on resume.
+    """
+    tagger = AsyncTagger(ollama.AsyncClient(host=host), concurrency, cache)
+    completed = 0
+    
+    async def tag_batch(batch: List[Dict]) -> List[List[str]]:
+        nonlocal completed
+        if len(batch) == 1:
+            all_tags = [await get_tags_async(tagger, batch[0]['text'], batch[0]['number'])]
+        else:
+            all_tags = await get_tags_batch_async(tagger, batch)
+        for paper, tags in zip(batch, all_tags):
+            completed += 1
+            if journal is not None:
+                journal.append(dict(paper, tags=tags), failed=not tags)
+            print(f"[{completed}/{len(papers)}] Federalist No. {paper['number']}: {', '.join(tags)}")
+        return all_tags
+    
+    batch_size = max(1, batch_size)
+    batches = [papers[i:i + batch_size] for i in range(0, len(papers), batch_size)]
+    results = await asyncio.gather(*(tag_batch(batch) for batch in batches))
+    print(f"Made {tagger.calls} model calls for {len(papers)} papers")
+    return [tags for batch_tags in results for tags in batch_tags]
+
+async def get_passage_tags_async(tagger: AsyncTagger, paper_num: int, passages: List[List],
+                                 retry: bool = True) -> List[Optional[List[str]]]:
+    """
+    Tag several passages of one paper with one JSON-formatted request.
+    Passages missing from or malformed in the response are retried one
+    passage per request; passages that still fail come back as None.
+    """
+    cache = tagger.cache
+    response = cache.get(MODEL, PASSAGE_TAGS_PROMPT_TEMPLATE, paper_num, passages) if cache is not None else None
+    if response is None:
+        label = f"paper #{paper_num} passages {passages[0][0]}-{passages[-1][0]}"
+        response = await tagger.generate(build_passage_prompt(paper_num, passages), label, format='json')
+        if response is not None and cache is not None and parse_batch_tags(response):
+            cache.put(response, MODEL, PASSAGE_TAGS_PROMPT_TEMPLATE, paper_num, passages)
+    
+    passage_tags = parse_batch_tags(response) if response is not None else {}
+    missing = [[index, passage] for index, passage in passages if index not in passage_tags]
+    if missing and retry:
+        retried = await asyncio.gather(*(get_passage_tags_async(tagger, paper_num, [pair], retry=False)
+                                         for pair in missing))
+        passage_tags.update({index: tags[0] for (index, _), tags in zip(missing, retried)})
+    return [passage_tags.get(index) for index, _ in passages]
+
+def passage_groups(text: str, passages_per_request: int) -> Tuple[List, List[List[List]]]:
+    """The (start, end) passage spans of a paper and its (passage number, text) pairs grouped per request."""
+    spans = chunk_spans(text, PASSAGE_CHARS)
+    passages = [[index, text[start:end]] for index, (start, end) in enumerate(spans, 1)]
+    per_request = max(1, passages_per_request)
+    return spans, [passages[i:i + per_request] for i in range(0, len(passages), per_request)]
+
+async def tag_papers_passages(papers: List[Dict], concurrency: int, host: Optional[str] = None,
+                              cache: Optional[LLMCache] = None, journal: Optional[Journal] = None,
+                              passages_per_request: int = PASSAGES_PER_REQUEST) -> List[List[str]]:
+    """
+    Tag the full text of every paper passage by passage, with the requests of
+    all papers sharing `concurrency` slots. Each paper gets weighted tags and
+    the (start, end) span and tags of every passage, and is appended to the
+    journal as soon as its last passage is tagged; a paper with passages
+    that could not be tagged is journaled as failed and retried on resume.
+    """
+    tagger = AsyncTagger(ollama.AsyncClient(host=host), concurrency, cache)
+    completed = 0
+    
+    async def tag_paper(paper: Dict) -> List[str]:
+        nonlocal completed
+        spans, groups = passage_groups(paper['text'], passages_per_request)
+        results = await asyncio.gather(*(get_passage_tags_async(tagger, paper['number'], group)
+                                         for group in groups))
+        passage_tags = [tags for group_tags in results for tags in group_tags]
+        failed = [index for index, tags in enumerate(passage_tags, 1) if tags is None]
+        if failed:
+            print(f"Federalist No. {paper['number']}: passages {failed} could not be tagged")
+        passage_tags = [tags or [] for tags in passage_tags]
+        
+        weights = aggregate_passage_tags(spans, passage_tags)
+        tags = paper_tags_from_weights(weights)
+        completed += 1
+        if journal is not None:
+            journal.append(dict(paper, tags=tags,
+                                tag_weights={tag: round(weight, 3) for tag, weight in weights.items()},
+                                passages=[{'start': start, 'end': end, 'tags': passage}
+                                          for (start, end), passage in zip(spans, passage_tags)]),
+                           failed=bool(failed) or not tags)
+        print(f"[{completed}/{len(papers)}] Federalist No. {paper['number']} "
+              f"({len(spans)} passages): {', '.join(tags)}")
+        return tags
+    
+    results = await asyncio.gather(*(tag_paper(paper) for paper in papers))
+    print(f"Made {tagger.calls} model calls for {len(papers)} papers")
+    return results
+
+def needs_model(papers: List[Dict], cache: Optional[LLMCache], passages: bool = False,
+                batch_size: int = 1, passages_per_request: int = PASSAGES_PER_REQUEST) -> bool:
+    """Whether tagging papers makes any model call, i.e. some response is not cached."""
+    if not papers:
+        return False
+    if cache is None:
+        return True
+    if passages:
+        return not all(cache.contains(MODEL, PASSAGE_TAGS_PROMPT_TEMPLATE, paper['number'], group)
+                       for paper in papers
+                       for group in passage_groups(paper['text'], passages_per_request)[1])
+    if batch_size > 1:
+        batches = [papers[i:i + batch_size] for i in range(0, len(papers), batch_size)]
+        return not all(cache.contains(MODEL, BATCH_TAGS_PROMPT_TEMPLATE, batch_excerpts(batch)) if len(batch) > 1
+                       else cache.contains(MODEL, TAGS_PROMPT_TEMPLATE, batch[0]['number'], batch[0]['text'][:1000])
+                       for batch in batches)
+    return not all(cache.contains(MODEL, TAGS_PROMPT_TEMPLATE, paper['number'], paper['text'][:1000])
+                   for paper in papers)
+
+def tag_papers_fast(papers: List[Dict], journal: Journal, training_file: str = 'fp_tagged.json',
+                    model_path: str = FAST_MODEL_PATH, keep_uncertain: bool = True) -> List[Dict]:
+    """
+    Tag papers with the local classifier trained on the LLM tags in
+    training_file, journaling each result marked as classifier output. With
+    keep_uncertain=False, low-confidence papers are left untagged and
+    returned so the caller can send them to the LLM.
+    """
+    tagger = get_tagger(training_file, model_path)
+    if not keep_uncertain and tagger.confident_margin == float('inf'):
+        print(f"Warning: no confidence margin of the local classifier reaches {FAST_TARGET_PRECISION:.0%} "
+              f"tag precision in cross-validation, so every paper goes to the LLM "
+              f"(see python fast_tagger.py report)")
+    start_time = time.time()
+    results = tagger.tag([paper['text'] for paper in papers])
+    print(f"Local classifier tagged {len(papers)} papers in {(time.time() - start_time) * 1000:.1f} ms")
+    
+    uncertain = []
+    for paper, (tags, confident) in zip(papers, results):
+        if not confident and not keep_uncertain:
+            uncertain.append(paper)
+            continue
+        journal.append(dict(paper, tags=tags, tag_source=FAST_TAG_SOURCE))
+    return uncertain
+
 def main():
-    # Check if Ollama is accessible
-    try:
-        print("Testing Ollama connection...")
-        ollama.generate(model='llama3.3:70b-instruct-q2_K', prompt='test')
-        print("Ollama connection successful!")
-    except Exception as e:
-        print(f"Error connecting to Ollama: {str(e)}")
-        print("Please make sure Ollama is installed and running.")
-        print("Try running: ollama pull llama3.3:70b-instruct-q2_K")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Add topic tags to the Federalist Papers using Ollama.')
+    parser.add_argument('--concurrency', type=int, default=1,
+                       help='Number of concurrent requests to Ollama; 1 runs the serial path (default: 1)')
+    parser.add_argument('--batch-size', type=int, default=1,
+                       help='Papers tagged per model request (default: 1)')
+    parser.add_argument('--host', default=None,
+                       help='Ollama server URL (default: the ollama client default)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                       help=f'SQLite file caching model responses (default: {DEFAULT_CACHE_PATH})')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Always call the model, ignoring cached responses')
+    parser.add_argument('--fast', action='store_true',
+                       help='Tag with the local classifier trained on the existing tags (see fast_tagger.py)')
+    parser.add_argument('--fallback', action='store_true',
+                       help='With --fast, send low-confidence papers to the LLM')
+    parser.add_argument('--fast-model', default=FAST_MODEL_PATH,
+                       help=f'Local classifier file used by --fast (default: {FAST_MODEL_PATH})')
+    parser.add_argument('--passages', action='store_true',
+                       help=f'Tag the full text in {PASSAGE_CHARS}-character passages instead of the first {PASSAGE_CHARS} characters')
+    parser.add_argument('--passage-batch', type=int, default=PASSAGES_PER_REQUEST,
+                       help=f'Passages tagged per model request with --passages (default: {PASSAGES_PER_REQUEST})')
+    args = parser.parse_args()
+    for option in ('concurrency', 'batch_size', 'passage_batch'):
+        if getattr(args, option) < 1:
+            parser.error(f"--{option.replace('_', '-')} must be at least 1")
+    
+    client = ollama.Client(host=args.host)
+    cache = None if args.no_cache else LLMCache(args.cache)
     
     # Read the edited JSON file
     try:
@@ -81,31 +438,94 @@ def main():
         print("Error: fp_edited.json not found. Please run clean_authors.py first.")
         sys.exit(1)
     
+    output_path = 'fp_tagged.json'
     total_papers = len(papers)
-    tagged_papers = []
+    start_time = time.time()
     
-    print(f"\nProcessing {total_papers} papers...")
+    # Reuse the tags of papers whose input hasn't changed since the last run
+    manifest = Manifest()
+    if args.passages:
+        llm_settings = ('passages', MODEL, PASSAGE_TAGS_PROMPT_TEMPLATE, PASSAGE_CHARS)
+    else:
+        llm_settings = (MODEL, TAGS_PROMPT_TEMPLATE)
+    settings = ('fast_tagger', args.fallback) + llm_settings if args.fast else llm_settings
+    reused = manifest.reusable('tags', papers, output_path, *settings)
+    if reused:
+        print(f"\nReusing {len(reused)} unchanged papers from {output_path}")
     
-    for i, paper in enumerate(papers, 1):
-        print(f"\nProcessing paper {i}/{total_papers}: Federalist No. {paper['number']}")
-        
-        # Get tags for the paper
-        tags = get_tags(paper['text'], paper['number'])
-        
-        # Create new paper object with tags
-        tagged_paper = paper.copy()
-        tagged_paper['tags'] = tags
-        tagged_papers.append(tagged_paper)
-        
-        print(f"Final tags: {', '.join(tags)}")
-        
-        # Add a small delay to avoid overwhelming Ollama
-        time.sleep(2)
+    # Resume from the journal of an interrupted run over the same input
+    journal = Journal(journal_path_for(output_path), inputs_hash(papers, *settings))
+    completed = journal.load()
+    pending = [paper for paper in papers if paper['number'] not in completed and paper['number'] not in reused]
+    if completed:
+        print(f"\nResuming: {len(completed)} papers already tagged in {journal.path}")
     
-    # Save to new JSON file
-    output_path = 'fp_tagged.json'
+    print(f"\nProcessing {len(pending)} papers...")
+    tagged_count = len(pending)
+    
+    if args.fast:
+        try:
+            pending = tag_papers_fast(pending, journal, output_path, args.fast_model,
+                                      keep_uncertain=not args.fallback)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: cannot train the local classifier: {e}")
+            print("Tag some papers with the LLM first (run add_tags.py without --fast).")
+            sys.exit(1)
+        if pending:
+            print(f"Sending {len(pending)} low-confidence papers to {MODEL}")
+    
+    # Check that Ollama has the model, only when some response is not cached
+    if needs_model(pending, cache, args.passages, args.batch_size, args.passage_batch):
+        try:
+            print("Testing Ollama connection...")
+            client.show(MODEL)
+            print("Ollama connection successful!")
+        except Exception as e:
+            print(f"Error connecting to Ollama: {str(e)}")
+            print("Please make sure Ollama is installed and running.")
+            print(f"Try running: ollama pull {MODEL}")
+            sys.exit(1)
+    
+    if pending and args.passages:
+        print(f"Tagging passages: up to {args.concurrency} requests concurrently, "
+              f"{args.passage_batch} passages per request")
+        asyncio.run(tag_papers_passages(pending, args.concurrency, args.host, cache, journal,
+                                        args.passage_batch))
+    elif pending and (args.concurrency > 1 or args.batch_size > 1):
+        print(f"Running up to {args.concurrency} requests concurrently, {args.batch_size} papers per request")
+        asyncio.run(tag_papers_async(pending, args.concurrency, args.host, cache, journal,
+                                     args.batch_size))
+    else:
+        for i, paper in enumerate(pending, total_papers - len(pending) + 1):
+            print(f"\nProcessing paper {i}/{total_papers}: Federalist No. {paper['number']}")
+            
+            # Get tags for the paper
+            misses = cache.misses if cache else 0
+            tags = get_tags(paper['text'], paper['number'], client, cache)
+            
+            # Create new paper object with tags
+            tagged_paper = paper.copy()
+            tagged_paper['tags'] = tags
+            journal.append(tagged_paper, failed=not tags)
+            
+            print(f"Final tags: {', '.join(tags)}")
+            
+            # Add a small delay to avoid overwhelming Ollama (cache hits never reach it)
+            if cache is None or cache.misses != misses:
+                time.sleep(2)
+    
+    print(f"\nTagged {tagged_count} papers in {time.time() - start_time:.1f} seconds")
+    if cache is not None:
+        cache.print_stats()
+    
+    # Assemble the output from the journal and save to new JSON file
+    tagged_papers = journal.assemble(papers, reused)
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(tagged_papers, f, indent=2, ensure_ascii=False)
+    write_binary_corpus(tagged_papers, binary_path_for(output_path))
+    # Papers left untagged are not recorded, so the next run retries them
+    manifest.record('tags', papers, tagged_papers, *settings, failed=journal.failed_numbers())
+    journal.remove()
     
     # Print statistics
     print("\nTag Statistics:")
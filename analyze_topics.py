@@ -1,15 +1,9 @@
-import json
-import re
 from collections import Counter
-
-def extract_tags(text):
-    """Extract tags from text that are marked with #tag format"""
-    return set(re.findall(r'#(\w+)', text))
+from corpus import get_corpus
 
 def create_topic_author_matrix():
     # Read the papers
-    with open('federalist_papers.json', 'r') as file:
-        papers = json.load(file)
+    corpus = get_corpus('federalist_papers.json')
     
     # Initialize counters
     authors = set()
@@ -18,7 +12,7 @@ def create_topic_author_matrix():
     topic_count = Counter()   # Count papers by topic
     author_topic_count = {}   # Count papers by author and topic
     
-    for paper in papers:
+    for paper in corpus:
         # Clean up author name
         author = paper['author'].split('\n')[0].strip()
         if 'Hamilton' in author:
@@ -32,7 +26,7 @@ def create_topic_author_matrix():
         author_count[author] += 1
         
         # Extract tags from text
-        tags = extract_tags(paper['text'])
+        tags = corpus.hashtags(paper['number'])
         for tag in tags:
             topics.add(tag)
             topic_count[tag] += 1
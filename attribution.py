@@ -0,0 +1,301 @@
+"""
+Authorship attribution from function-word rates, after Mosteller & Wallace.
+
+Every paper becomes a vector of rates per 1000 words of the non-content
+words word_analysis.STOP_WORDS filters out, plus the classic marker words
+(upon, whilst, enough...). Two classifiers trained on the Hamilton, Madison
+and Jay papers score the rest:
+
+    delta   Burrows' Delta: mean absolute z-score distance to each author
+    bayes   Poisson naive Bayes on the word counts, reported as probabilities
+
+Feature vectors are cached next to the document-term matrix. Leave-one-out
+evaluation is computed in closed form for all papers at once, with the
+held-out paper subtracted from its author's totals.
+
+Usage:
+    python attribution.py                 # attribute Unknown and disputed papers
+    python attribution.py --evaluate      # leave-one-out accuracy on the known papers
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from doc_term_matrix import dtm_path_for, get_matrix
+from stats_engine import FUNCTION_WORDS
+from word_analysis import STOP_WORDS
+
+AUTHORS = ('Hamilton', 'Madison', 'Jay')
+
+# Papers traditionally claimed by both Hamilton and Madison
+DISPUTED_PAPERS = (49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 62, 63)
+
+# Additive smoothing of the Poisson rates, in counts per word
+SMOOTHING = 0.5
+
+def feature_words() -> List[str]:
+    return sorted(STOP_WORDS | set(FUNCTION_WORDS))
+
+class Features:
+    """Function-word counts and total word counts of every paper."""
+
+    def __init__(self, numbers: List[int], authors: List[str], words: List[str],
+                 counts: np.ndarray, totals: np.ndarray):
+        self.numbers = numbers
+        self.authors = authors
+        self.words = words
+        self.counts = counts
+        self.totals = totals
+
+    @property
+    def rates(self) -> np.ndarray:
+        """Occurrences of each feature word per 1000 words."""
+        return self.counts * 1000.0 / np.maximum(self.totals, 1)[:, None]
+
+def features_path_for(json_file: str) -> str:
+    return os.path.join(dtm_path_for(json_file), 'function_words.npz')
+
+def get_features(json_file: str = 'fp_tagged.json') -> Features:
+    """
+    Return the feature vectors of every paper, from the cache when it was
+    built from the current matrix with the current word list.
+    """
+    matrix = get_matrix(json_file)
+    words = feature_words()
+    path = features_path_for(json_file)
+    signature = np.array(matrix.signature or [], dtype=np.int64)
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if np.array_equal(data['signature'], signature) and data['words'].tolist() == words:
+                return Features(matrix.numbers, matrix.authors, words, data['counts'], data['totals'])
+    except (OSError, KeyError, ValueError):
+        pass
+
+    # Columns of the feature words; words absent from the corpus stay zero
+    column = np.searchsorted(matrix.vocab, words)
+    column = np.minimum(column, len(matrix.vocab) - 1)
+    present = np.asarray(matrix.vocab)[column] == np.array(words)
+    rows = np.repeat(np.arange(len(matrix.numbers)), np.diff(matrix.indptr))
+    indices = np.asarray(matrix.indices)
+    data = np.asarray(matrix.data)
+    slot = np.full(len(matrix.vocab), -1, dtype=np.int64)
+    slot[column[present]] = np.flatnonzero(present)
+    hit = slot[indices] >= 0
+    counts = np.bincount(rows[hit] * len(words) + slot[indices][hit], weights=data[hit],
+                         minlength=len(matrix.numbers) * len(words)).reshape(len(matrix.numbers), len(words))
+    totals = np.bincount(rows, weights=data, minlength=len(matrix.numbers))
+
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, signature=signature, words=np.array(words, dtype=str),
+                     counts=counts, totals=totals)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: could not save feature vectors to {path}: {e}")
+    return Features(matrix.numbers, matrix.authors, words, counts, totals)
+
+def training_split(features: Features, include_disputed: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (train_rows, author_index) of the papers with a known author."""
+    disputed = set() if include_disputed else set(DISPUTED_PAPERS)
+    rows = [row for row, (number, author) in enumerate(zip(features.numbers, features.authors))
+            if author in AUTHORS and number not in disputed]
+    return np.array(rows, dtype=np.int64), np.array([AUTHORS.index(features.authors[row]) for row in rows])
+
+def _author_sums(values: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    sums = np.zeros((len(AUTHORS),) + values.shape[1:])
+    np.add.at(sums, labels, values)
+    return sums
+
+def delta_scores(rates: np.ndarray, labels: np.ndarray, targets: np.ndarray,
+                 leave_one_out: bool = False) -> np.ndarray:
+    """
+    Burrows' Delta of each target paper to each author (lower is closer).
+    With leave_one_out, targets are the training rows themselves and each is
+    removed from the statistics before being scored.
+    """
+    n = len(rates)
+    sums = rates.sum(axis=0)
+    squares = (rates ** 2).sum(axis=0)
+    author_sums = _author_sums(rates, labels)
+    author_sizes = np.bincount(labels, minlength=len(AUTHORS)).astype(float)
+
+    if leave_one_out:
+        # Per target: corpus mean/std and author means without that paper
+        count = n - 1
+        mean = (sums - targets) / count
+        var = ((squares - targets ** 2) - count * mean ** 2) / max(count - 1, 1)
+        own = np.zeros((len(targets), len(AUTHORS), 1))
+        own[np.arange(len(targets)), labels] = 1
+        centroid_sums = author_sums[None, :, :] - own * targets[:, None, :]
+        centroid_sizes = author_sizes[None, :, None] - own
+        centroids = centroid_sums / np.maximum(centroid_sizes, 1)
+    else:
+        mean = sums / n
+        var = (squares - n * mean ** 2) / max(n - 1, 1)
+        centroids = (author_sums / np.maximum(author_sizes, 1)[:, None])[None, :, :]
+        mean = np.broadcast_to(mean, targets.shape)
+        var = np.broadcast_to(var, targets.shape)
+
+    std = np.sqrt(np.maximum(var, 0))
+    # Words that never vary carry no information
+    usable = std > 1e-9
+    scale = np.where(usable, std, 1)[:, None, :]
+    z_gap = np.where(usable[:, None, :], (targets[:, None, :] - centroids) / scale, 0)
+    return np.abs(z_gap).sum(axis=2) / np.maximum(usable.sum(axis=1), 1)[:, None]
+
+def bayes_scores(counts: np.ndarray, totals: np.ndarray, labels: np.ndarray,
+                 targets: np.ndarray, target_totals: np.ndarray, leave_one_out: bool = False) -> np.ndarray:
+    """
+    Posterior probability of each author for each target paper under a
+    Poisson model of the feature-word counts with equal priors. With
+    leave_one_out, each target is removed from its own author's rates.
+    """
+    author_counts = _author_sums(counts, labels)
+    author_totals = _author_sums(totals, labels)
+    if leave_one_out:
+        own = np.zeros((len(targets), len(AUTHORS), 1))
+        own[np.arange(len(targets)), labels] = 1
+        author_counts = author_counts[None, :, :] - own * targets[:, None, :]
+        author_totals = author_totals[None, :] - own[:, :, 0] * target_totals[:, None]
+    else:
+        author_counts = author_counts[None, :, :]
+        author_totals = author_totals[None, :]
+
+    # Expected occurrences per word of running text, smoothed
+    rates = (author_counts + SMOOTHING) / (author_totals[:, :, None] + SMOOTHING * counts.shape[1])
+    log_likelihood = ((targets[:, None, :] * np.log(rates)).sum(axis=2)
+                      - target_totals[:, None] * rates.sum(axis=2))
+    log_likelihood -= log_likelihood.max(axis=1, keepdims=True)
+    posterior = np.exp(log_likelihood)
+    return posterior / posterior.sum(axis=1, keepdims=True)
+
+def evaluate(features: Features, include_disputed: bool = False) -> Dict[str, float]:
+    """Leave-one-out accuracy of both classifiers over the known papers."""
+    rows, labels = training_split(features, include_disputed)
+    rates = features.rates[rows]
+    counts = features.counts[rows]
+    totals = features.totals[rows]
+
+    delta = delta_scores(rates, labels, rates, leave_one_out=True)
+    bayes = bayes_scores(counts, totals, labels, counts, totals, leave_one_out=True)
+    results = {}
+    for name, predicted in (('delta', delta.argmin(axis=1)), ('bayes', bayes.argmax(axis=1))):
+        results[name] = float((predicted == labels).mean())
+        for i, author in enumerate(AUTHORS):
+            mask = labels == i
+            if mask.any():
+                results[f"{name} {author}"] = float((predicted[mask] == i).mean())
+        misses = [int(features.numbers[row]) for row, p, l in zip(rows, predicted, labels) if p != l]
+        results[f"{name} misattributed"] = misses
+    results['papers'] = len(rows)
+    return results
+
+def attribute(features: Features, numbers: Optional[List[int]] = None,
+              include_disputed: bool = False) -> List[dict]:
+    """
+    Score the given papers (by default the Unknown and disputed ones) with
+    classifiers trained on every other paper of known authorship. A
+    requested paper that is itself a training paper is held out of the
+    training data before it is scored. Raises ValueError for numbers that
+    are not in the corpus.
+    """
+    rows, labels = training_split(features, include_disputed)
+    if numbers is None:
+        training = set(rows.tolist())
+        targets = [row for row in range(len(features.numbers)) if row not in training]
+    else:
+        unknown = sorted(set(numbers) - set(features.numbers))
+        if unknown:
+            raise ValueError(f"Papers not in the corpus: {', '.join(map(str, unknown))}")
+        wanted = set(numbers)
+        targets = [row for row, number in enumerate(features.numbers) if number in wanted]
+    targets = np.array(targets, dtype=np.int64)
+    if not len(targets):
+        return []
+
+    delta = delta_scores(features.rates[rows], labels, features.rates[targets])
+    bayes = bayes_scores(features.counts[rows], features.totals[rows], labels,
+                         features.counts[targets], features.totals[targets])
+    # Training papers are scored leave-one-out, by a model trained without them
+    position = {row: i for i, row in enumerate(rows.tolist())}
+    held_out = [i for i, row in enumerate(targets.tolist()) if row in position]
+    if held_out:
+        training_rows = [position[row] for row in targets[held_out].tolist()]
+        rates = features.rates[rows]
+        counts = features.counts[rows]
+        totals = features.totals[rows]
+        delta[held_out] = delta_scores(rates, labels, rates, leave_one_out=True)[training_rows]
+        bayes[held_out] = bayes_scores(counts, totals, labels, counts, totals,
+                                       leave_one_out=True)[training_rows]
+
+    results = []
+    for i, row in enumerate(targets):
+        results.append({
+            'number': features.numbers[row],
+            'listed_author': features.authors[row],
+            'held_out': i in held_out,
+            'delta': dict(zip(AUTHORS, delta[i].round(4).tolist())),
+            'delta_author': AUTHORS[int(delta[i].argmin())],
+            'bayes': dict(zip(AUTHORS, bayes[i].round(4).tolist())),
+            'bayes_author': AUTHORS[int(bayes[i].argmax())],
+        })
+    return sorted(results, key=lambda result: result['number'])
+
+def print_attributions(results: List[dict]):
+    print("\nAttribution by function-word rates:")
+    print("-" * 78)
+    print(f"{'Paper':>5}  {'Listed':<10} {'Delta':<10} {'H / M / J distance':<22} {'Bayes':<10} P(author)")
+    print("-" * 78)
+    for result in results:
+        distances = ' / '.join(f"{result['delta'][author]:.2f}" for author in AUTHORS)
+        probability = result['bayes'][result['bayes_author']]
+        marker = '  (held out of training)' if result['held_out'] else ''
+        print(f"{result['number']:>5}  {result['listed_author']:<10} {result['delta_author']:<10} "
+              f"{distances:<22} {result['bayes_author']:<10} {probability:.3f}{marker}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Attribute the authorship of the Federalist Papers from function-word rates.')
+    parser.add_argument('papers', type=int, nargs='*',
+                        help='Paper numbers to attribute (default: Unknown and disputed papers)')
+    parser.add_argument('--json', default='fp_tagged.json',
+                        help='Corpus JSON file (default: fp_tagged.json)')
+    parser.add_argument('--evaluate', action='store_true',
+                        help='Report leave-one-out accuracy on the papers of known authorship')
+    parser.add_argument('--include-disputed', action='store_true',
+                        help=f'Train on the disputed papers {DISPUTED_PAPERS} under their listed author')
+    args = parser.parse_args()
+
+    try:
+        start_time = time.time()
+        features = get_features(args.json)
+    except FileNotFoundError:
+        print(f"Error: {args.json} not found.")
+        sys.exit(1)
+    print(f"Feature vectors of {len(features.numbers)} papers over {len(features.words)} "
+          f"function words ready in {time.time() - start_time:.2f} seconds")
+
+    if args.evaluate:
+        start_time = time.time()
+        results = evaluate(features, args.include_disputed)
+        print(f"\nLeave-one-out evaluation over {results['papers']} papers "
+              f"({time.time() - start_time:.2f} seconds):")
+        for name in ('delta', 'bayes'):
+            per_author = ', '.join(f"{author} {results[f'{name} {author}']:.0%}"
+                                   for author in AUTHORS if f'{name} {author}' in results)
+            print(f"{name:<6} accuracy {results[name]:.1%} ({per_author})")
+            if results[f'{name} misattributed']:
+                print(f"       misattributed papers: {results[f'{name} misattributed']}")
+        return
+
+    try:
+        results = attribute(features, args.papers or None, args.include_disputed)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print_attributions(results)
+
+if __name__ == "__main__":
+    main()
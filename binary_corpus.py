@@ -0,0 +1,177 @@
+"""
+Compact binary corpus format with random access by paper number.
+
+Layout (little-endian):
+    header      magic b'FPCB', version (u16), reserved (u16), paper count (u32)
+    table       per paper: number (u32), metadata offset (u64), metadata length (u32),
+                text offset (u64), text length (u32)
+    metadata    one compact JSON object per paper, with "text" set to null
+    text        the UTF-8 text of each paper
+
+Readers mmap the file and decode only the papers they touch.
+
+Usage:
+    python binary_corpus.py to-binary fp_tagged.json [fp_tagged.fpc]
+    python binary_corpus.py to-json fp_tagged.fpc [fp_tagged.json]
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from typing import Dict, Iterator, List, Optional
+
+MAGIC = b'FPCB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')
+ENTRY = struct.Struct('<IQIQI')
+
+def binary_path_for(json_path: str) -> str:
+    """Return the path of the binary corpus that mirrors a JSON file."""
+    return os.path.splitext(json_path)[0] + '.fpc'
+
+def is_fresh(binary_path: str, json_path: str) -> bool:
+    """True if binary_path exists and is at least as new as json_path."""
+    try:
+        binary_mtime = os.stat(binary_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+    try:
+        return binary_mtime >= os.stat(json_path).st_mtime_ns
+    except FileNotFoundError:
+        return True
+
+def write_binary_corpus(papers: List[Dict], path: str):
+    """Write papers to path in the binary corpus format."""
+    metadata = []
+    texts = []
+    for paper in papers:
+        record = dict(paper)
+        record['text'] = None
+        metadata.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        texts.append(paper['text'].encode('utf-8'))
+
+    offset = HEADER.size + ENTRY.size * len(papers)
+    table = []
+    meta_offsets = []
+    for blob in metadata:
+        meta_offsets.append(offset)
+        offset += len(blob)
+    for paper, meta_offset, meta_blob, text_blob in zip(papers, meta_offsets, metadata, texts):
+        table.append(ENTRY.pack(paper['number'], meta_offset, len(meta_blob), offset, len(text_blob)))
+        offset += len(text_blob)
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(papers)))
+        f.writelines(table)
+        f.writelines(metadata)
+        f.writelines(texts)
+    os.replace(tmp_path, path)
+
+class BinaryCorpus:
+    """Memory-mapped reader for the binary corpus format."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {VERSION} binary corpus")
+        self._entries = {}
+        try:
+            for entry in struct.iter_unpack(ENTRY.format, self._map[HEADER.size:HEADER.size + ENTRY.size * count]):
+                self._entries[entry[0]] = entry[1:]
+        except struct.error:
+            self._map.close()
+            raise ValueError(f"{path} is truncated")
+        # A file cut short would otherwise decode to partial papers
+        if any(max(meta_offset + meta_len, text_offset + text_len) > len(self._map)
+               for meta_offset, meta_len, text_offset, text_len in self._entries.values()):
+            self._map.close()
+            raise ValueError(f"{path} is truncated")
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self) -> 'BinaryCorpus':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, number: int) -> bool:
+        return number in self._entries
+
+    def numbers(self) -> List[int]:
+        """Paper numbers in file order."""
+        return list(self._entries)
+
+    def metadata(self, number: int) -> Dict:
+        """Decode the metadata of one paper (its text is None)."""
+        meta_offset, meta_len, _, _ = self._entries[number]
+        return json.loads(self._map[meta_offset:meta_offset + meta_len].decode('utf-8'))
+
+    def text(self, number: int) -> str:
+        """Decode the text of one paper."""
+        _, _, text_offset, text_len = self._entries[number]
+        return self._map[text_offset:text_offset + text_len].decode('utf-8')
+
+    def get(self, number: int) -> Optional[Dict]:
+        """Decode one paper, or return None if the number is not present."""
+        if number not in self._entries:
+            return None
+        paper = self.metadata(number)
+        paper['text'] = self.text(number)
+        return paper
+
+    def __iter__(self) -> Iterator[Dict]:
+        for number in self._entries:
+            yield self.get(number)
+
+def json_to_binary(json_path: str, binary_path: Optional[str] = None) -> str:
+    """Convert a papers JSON file to the binary format."""
+    binary_path = binary_path or binary_path_for(json_path)
+    with open(json_path, 'r', encoding='utf-8') as f:
+        papers = json.load(f)
+    write_binary_corpus(papers, binary_path)
+    return binary_path
+
+def binary_to_json(binary_path: str, json_path: Optional[str] = None) -> str:
+    """Convert a binary corpus back to a papers JSON file."""
+    json_path = json_path or os.path.splitext(binary_path)[0] + '.json'
+    with BinaryCorpus(binary_path) as corpus:
+        papers = list(corpus)
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(papers, f, indent=2, ensure_ascii=False)
+    return json_path
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert Federalist Papers between JSON and the binary corpus format.')
+    parser.add_argument('direction', choices=['to-binary', 'to-json'], help='Conversion direction')
+    parser.add_argument('input', help='Input file')
+    parser.add_argument('output', nargs='?', help='Output file (default: input with .fpc/.json extension)')
+    args = parser.parse_args()
+
+    try:
+        if args.direction == 'to-binary':
+            output_path = json_to_binary(args.input, args.output)
+        else:
+            output_path = binary_to_json(args.input, args.output)
+    except FileNotFoundError:
+        print(f"Error: {args.input} not found.")
+        sys.exit(1)
+    except (json.JSONDecodeError, ValueError, struct.error) as e:
+        print(f"Error: could not read {args.input}: {e}")
+        sys.exit(1)
+
+    print(f"Output saved to {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+def journal_path_for(output_path: str) -> str:
+    """Return the path of the journal that checkpoints an output file."""
+    return os.path.splitext(output_path)[0] + '.journal.jsonl'
+
+class Journal:
+    """
+    Append-only JSONL journal of processed papers. Each record is flushed to
+    disk as soon as it is written, so a crashed run can resume from it.
+
+    The first line is a header holding a hash of the run's input (see
+    manifest.inputs_hash); a journal left by a run over different input is
+    discarded. Papers whose processing failed are recorded as
+    {"status": "failed", "paper": ...}: they are kept in the assembled
+    output but processed again on resume.
+    """
+
+    def __init__(self, path: str, input_hash: Optional[str] = None):
+        self.path = path
+        self.input_hash = input_hash
+        self._file = None
+
+    def _records(self) -> List[dict]:
+        """Every intact record after the header. A torn last line is ignored."""
+        records = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+        except FileNotFoundError:
+            return []
+
+        header = records[0].get('journal') if records and 'journal' in records[0] else None
+        if header is None or header.get('input') != self.input_hash:
+            print(f"Discarding {self.path}: it was written for different input")
+            self.remove()
+            return []
+        return records[1:]
+
+    def _latest(self) -> Tuple[Dict[int, dict], Dict[int, dict]]:
+        """(completed, failed) papers keyed by number; the latest record of a paper wins."""
+        completed, failed = {}, {}
+        for record in self._records():
+            if record.get('status') == 'failed':
+                paper = record['paper']
+                completed.pop(paper['number'], None)
+                failed[paper['number']] = paper
+            else:
+                failed.pop(record['number'], None)
+                completed[record['number']] = record
+        return completed, failed
+
+    def load(self) -> Dict[int, dict]:
+        """Return the successfully completed papers keyed by number."""
+        return self._latest()[0]
+
+    def failed_numbers(self) -> List[int]:
+        """Numbers of the papers whose latest record is a failure."""
+        return sorted(self._latest()[1])
+
+    def append(self, paper: dict, failed: bool = False):
+        """Record one processed paper and flush it to disk."""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+            if self._file.tell() == 0:
+                self._file.write(json.dumps({'journal': {'input': self.input_hash}}) + '\n')
+            else:
+                # Start on a fresh line if the previous run died mid-record
+                with open(self.path, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        self._file.write('\n')
+        record = {'status': 'failed', 'paper': paper} if failed else paper
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def assemble(self, papers: List[dict], reused: Optional[Dict[int, dict]] = None) -> List[dict]:
+        """
+        Return the journaled version of each paper, in the order of papers.
+        Papers missing from the journal fall back to their record in reused.
+        Failed papers are included as they were recorded.
+        """
+        completed, failed = self._latest()
+        merged = dict(reused or {})
+        merged.update(failed)
+        merged.update(completed)
+        return [merged[paper['number']] for paper in papers if paper['number'] in merged]
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        """Delete the journal once its output has been written."""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -1,5 +1,7 @@
 import json
 import re
+import argparse
+from binary_corpus import binary_path_for, write_binary_corpus
 
 def clean_author(author: str) -> str:
     """Clean up author field to contain only Hamilton, Madison, or Jay."""
@@ -19,12 +21,19 @@ def clean_author(author: str) -> str:
         return 'Unknown'
 
 def main():
+    parser = argparse.ArgumentParser(description='Normalize the author of each Federalist Paper.')
+    parser.add_argument('--input', default='federalist_papers.json',
+                        help='Papers to read (default: federalist_papers.json)')
+    parser.add_argument('--output', default='fp_edited.json',
+                        help='File to write (default: fp_edited.json)')
+    args = parser.parse_args()
+    
     # Read the original JSON file
     try:
-        with open('federalist_papers.json', 'r', encoding='utf-8') as f:
+        with open(args.input, 'r', encoding='utf-8') as f:
             papers = json.load(f)
     except FileNotFoundError:
-        print("Error: federalist_papers.json not found.")
+        print(f"Error: {args.input} not found.")
         return
     
     # Clean up authors
@@ -38,9 +47,10 @@ def main():
         author_counts[cleaned_paper['author']] += 1
     
     # Save to new JSON file
-    output_path = 'fp_edited.json'
+    output_path = args.output
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(cleaned_papers, f, indent=2, ensure_ascii=False)
+    write_binary_corpus(cleaned_papers, binary_path_for(output_path))
     
     # Print statistics
     print("\nAuthor Statistics:")
@@ -0,0 +1,330 @@
+import json
+import os
+import re
+import struct
+from typing import Dict, Iterator, List, Optional
+from binary_corpus import BinaryCorpus, binary_path_for, is_fresh, write_binary_corpus
+from search_index import source_signature
+
+DEFAULT_JSON = 'fp_tagged.json'
+PAPER_INDEX_VERSION = 2
+SEPARATOR = re.compile(r'[\s,]*')
+# Papers whose byte ranges are at most this far apart are read with one read() call
+MAX_READ_GAP = 4096
+
+# Corpora already opened in this process, keyed by absolute JSON path
+_corpora: Dict[str, 'Corpus'] = {}
+
+def count_words(text: str) -> int:
+    """Count words in text"""
+    words = text.strip().split()
+    return len(words)
+
+def extract_hashtags(text: str) -> set:
+    """Extract tags from text that are marked with #tag format"""
+    return set(re.findall(r'#(\w+)', text))
+
+def paper_index_path_for(json_path: str) -> str:
+    """Return the path of the paper-number index that belongs to a JSON file."""
+    return os.path.splitext(json_path)[0] + '.pidx'
+
+def build_paper_index(json_path: str) -> Dict[int, list]:
+    """
+    Scan a papers JSON file once and return, for every paper number, the
+    [byte offset, byte length, word count, tags, author] of its JSON object.
+    Tags are the inline #tags if the text has any, otherwise the tags field,
+    as in Corpus.tags.
+    """
+    # newline='' keeps \r\n intact so character and byte positions line up
+    with open(json_path, 'r', encoding='utf-8', newline='') as f:
+        raw = f.read()
+    decoder = json.JSONDecoder()
+    index = {}
+    position = raw.index('[') + 1
+    # Character positions are turned into byte offsets incrementally
+    char_cursor = byte_cursor = 0
+    while True:
+        position = SEPARATOR.match(raw, position).end()
+        if raw[position] == ']':
+            break
+        paper, end = decoder.raw_decode(raw, position)
+        byte_cursor += len(raw[char_cursor:position].encode('utf-8'))
+        length = len(raw[position:end].encode('utf-8'))
+        char_cursor, start = end, byte_cursor
+        byte_cursor += length
+        hashtags = extract_hashtags(paper['text'])
+        tags = sorted(hashtags) if hashtags else paper.get('tags')
+        index[paper['number']] = [start, length, count_words(paper['text']), tags, paper.get('author', '')]
+        position = end
+    return index
+
+def load_paper_index(json_path: str) -> Optional[Dict[int, list]]:
+    """
+    Return the paper-number index of a JSON file, building and saving it if
+    it is missing or the JSON has changed since it was written.
+    """
+    signature = source_signature(json_path)
+    if signature is None:
+        return None
+    path = paper_index_path_for(json_path)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == PAPER_INDEX_VERSION and data.get('signature') == list(signature):
+            return {int(number): entry for number, entry in data['papers'].items()}
+    except (OSError, ValueError):
+        pass
+
+    try:
+        index = build_paper_index(json_path)
+    except (OSError, ValueError, KeyError, IndexError):
+        return None
+    try:
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': PAPER_INDEX_VERSION, 'signature': list(signature), 'papers': index},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: could not save paper index to {path}: {e}")
+    return index
+
+class Corpus:
+    """
+    Papers from one JSON file, keyed by paper number.
+
+    The file is parsed at most once. Single papers are read through the
+    paper-number index (<stem>.pidx), which holds the byte range of every
+    paper in the JSON file plus its word count and tags, so a lookup decodes
+    only that paper's bytes. The index is built on first use and whenever
+    the JSON changes. Without it, papers come from the memory-mapped binary
+    mirror of the JSON file (see binary_corpus.py).
+    """
+
+    def __init__(self, json_path: str):
+        self.json_path = json_path
+        self._papers: Optional[Dict[int, dict]] = None
+        self._single: Dict[int, dict] = {}
+        self._binary: Optional[BinaryCorpus] = None
+        self._index: Optional[Dict[int, list]] = None
+        self._index_loaded = False
+        self._word_counts: Dict[int, int] = {}
+        self._hashtags: Dict[int, set] = {}
+
+    def _load_all(self) -> Dict[int, dict]:
+        if self._papers is None:
+            binary_path = binary_path_for(self.json_path)
+            papers = None
+            fresh = is_fresh(binary_path, self.json_path)
+            if fresh:
+                try:
+                    with BinaryCorpus(binary_path) as binary:
+                        papers = list(binary)
+                except (OSError, ValueError, struct.error):
+                    papers = None
+            if papers is None:
+                with open(self.json_path, 'r', encoding='utf-8') as f:
+                    papers = json.load(f)
+                if fresh:
+                    # The mirror is newer than the JSON but unreadable: write it again
+                    try:
+                        write_binary_corpus(papers, binary_path)
+                    except OSError:
+                        pass
+            self._papers = {paper['number']: paper for paper in papers}
+            self._single.clear()
+        return self._papers
+
+    def _open_binary(self) -> Optional[BinaryCorpus]:
+        """Open the binary mirror, writing it first if it is missing or stale."""
+        if self._binary is None:
+            binary_path = binary_path_for(self.json_path)
+            try:
+                if not is_fresh(binary_path, self.json_path):
+                    write_binary_corpus(list(self._load_all().values()), binary_path)
+                try:
+                    self._binary = BinaryCorpus(binary_path)
+                except (ValueError, struct.error):
+                    # Corrupt although newer than the JSON: write it again
+                    write_binary_corpus(list(self._load_all().values()), binary_path)
+                    self._binary = BinaryCorpus(binary_path)
+            except (OSError, ValueError, struct.error):
+                return None
+        return self._binary
+
+    def _open_index(self) -> Optional[Dict[int, list]]:
+        if not self._index_loaded:
+            self._index = load_paper_index(self.json_path)
+            self._index_loaded = True
+        return self._index
+
+    def _read_indexed(self, numbers: List[int]) -> Dict[int, dict]:
+        """
+        Decode the papers with these numbers from their byte ranges. Papers
+        that lie close together in the file are fetched with a single read.
+        """
+        entries = sorted((self._index[number][0], self._index[number][1], number)
+                         for number in set(numbers) if number in self._index)
+        papers = {}
+        with open(self.json_path, 'rb') as f:
+            i = 0
+            while i < len(entries):
+                # Extend the run while the next paper starts close to the end of this one
+                j = i + 1
+                while j < len(entries) and entries[j][0] - sum(entries[j - 1][:2]) <= MAX_READ_GAP:
+                    j += 1
+                run_start = entries[i][0]
+                f.seek(run_start)
+                data = f.read(sum(entries[j - 1][:2]) - run_start)
+                for offset, length, number in entries[i:j]:
+                    papers[number] = json.loads(data[offset - run_start:offset - run_start + length])
+                i = j
+        return papers
+
+    def _load_one(self, number: int) -> Optional[dict]:
+        """Decode only the JSON object of one paper, or None if it can't be located."""
+        with open(self.json_path, 'r', encoding='utf-8') as f:
+            raw = f.read()
+        match = re.search(r'\{\s*"number"\s*:\s*%d\s*[,}]' % number, raw)
+        if not match:
+            return None
+        paper, _ = json.JSONDecoder().raw_decode(raw, match.start())
+        return paper
+
+    @property
+    def papers(self) -> Dict[int, dict]:
+        """All papers keyed by number, in file order."""
+        return self._load_all()
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.papers.values())
+
+    def __len__(self) -> int:
+        return len(self.papers)
+
+    def sorted_papers(self) -> List[dict]:
+        """All papers sorted by number."""
+        return [self.papers[number] for number in sorted(self.papers)]
+
+    def get(self, number: int) -> Optional[dict]:
+        """Return the stored paper with this number, or None."""
+        if self._papers is not None:
+            return self._papers.get(number)
+        if number not in self._single:
+            index = self._open_index()
+            if index is not None:
+                if number not in index:
+                    return None
+                self._single.update(self._read_indexed([number]))
+                return self._single[number]
+            binary = self._open_binary()
+            if self._papers is not None:
+                return self._papers.get(number)
+            if binary is not None:
+                paper = binary.get(number)
+            else:
+                paper = self._load_one(number)
+                if paper is None or paper.get('number') != number:
+                    return self._load_all().get(number)
+            if paper is None:
+                return None
+            self._single[number] = paper
+        return self._single[number]
+
+    def word_count(self, number: int) -> int:
+        """Number of whitespace-separated words in a paper."""
+        if number not in self._word_counts:
+            index = self._open_index() if self._papers is None else None
+            if index is not None and number in index:
+                self._word_counts[number] = index[number][2]
+            else:
+                self._word_counts[number] = count_words(self.get(number)['text'])
+        return self._word_counts[number]
+
+    def hashtags(self, number: int) -> set:
+        """Tags written inline in a paper's text as #tag."""
+        if number not in self._hashtags:
+            self._hashtags[number] = extract_hashtags(self.get(number)['text'])
+        return self._hashtags[number]
+
+    def tags(self, number: int) -> Optional[List[str]]:
+        """Inline #tags if the text has any, otherwise the paper's tags field."""
+        index = self._open_index() if self._papers is None else None
+        if index is not None and number in index:
+            tags = index[number][3]
+        else:
+            hashtags = self.hashtags(number)
+            if hashtags:
+                return sorted(hashtags)
+            tags = self.get(number).get('tags')
+        # A copy, so callers cannot modify the cached index or paper
+        return list(tags) if tags is not None else None
+
+    def get_paper(self, number: int) -> Optional[dict]:
+        """Return a copy of a paper with its word count and tags filled in."""
+        paper = self.get(number)
+        if paper is None:
+            return None
+        paper = dict(paper)
+        tags = self.tags(number)
+        if tags is not None:
+            paper['tags'] = tags
+        paper['word_count'] = self.word_count(number)
+        return paper
+
+    def author(self, number: int) -> str:
+        """A paper's author field, without decoding its text when the index is available."""
+        index = self._open_index() if self._papers is None else None
+        if index is not None and number in index:
+            return index[number][4]
+        return self.get(number).get('author', '')
+
+    def paper_numbers(self) -> List[int]:
+        """All paper numbers, sorted, without decoding any paper when the index is available."""
+        index = self._open_index() if self._papers is None else None
+        return sorted(index if index is not None else self.papers)
+
+    def iter_papers(self, numbers: Optional[List[int]] = None) -> Iterator[dict]:
+        """
+        Yield copies of papers as get_paper does, in the order of numbers (all
+        papers sorted by number by default). Papers read through the index
+        are decoded one at a time and not kept, so memory stays flat however
+        large the corpus is.
+        """
+        numbers = self.paper_numbers() if numbers is None else numbers
+        for number in numbers:
+            index = self._open_index() if self._papers is None else None
+            if index is None or number in self._single:
+                paper = self.get_paper(number)
+            elif number in index:
+                paper = self._read_indexed([number])[number]
+                if index[number][3] is not None:
+                    paper['tags'] = list(index[number][3])
+                paper['word_count'] = index[number][2]
+            else:
+                paper = None
+            if paper is not None:
+                yield paper
+
+    def get_papers(self, numbers: List[int]) -> Dict[int, dict]:
+        """
+        Return copies of the papers with these numbers, as get_paper does,
+        keyed by number in the requested order. Missing numbers are left out.
+        """
+        index = self._open_index() if self._papers is None else None
+        if index is not None:
+            wanted = [number for number in numbers if number in index and number not in self._single]
+            self._single.update(self._read_indexed(wanted))
+        papers = {}
+        for number in numbers:
+            paper = self.get_paper(number)
+            if paper is not None:
+                papers[number] = paper
+        return papers
+
+def get_corpus(json_path: str = DEFAULT_JSON) -> Corpus:
+    """Return the shared Corpus for a JSON file, creating it on first use."""
+    key = os.path.abspath(json_path)
+    if key not in _corpora:
+        _corpora[key] = Corpus(json_path)
+    return _corpora[key]
@@ -0,0 +1,217 @@
+"""
+Persistent sparse paper x vocabulary count matrix.
+
+The matrix is stored in CSR form as .npy arrays in a <stem>.dtm directory
+next to the corpus JSON and memory-mapped on load, so top-N word queries for
+a paper, an author or the whole corpus are a bincount over a few slices plus
+an argpartition, without re-tokenizing any text.
+
+Tokens are exactly the words word_analysis.clean_text(text).split() yields.
+All words are counted; stop-word and minimum-length filtering is a mask over
+the vocabulary applied at query time, so one matrix serves every setting.
+"""
+import json
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from corpus import get_corpus
+from search_index import source_signature
+
+DTM_VERSION = 1
+WORD_PATTERN = re.compile(r'\w+')
+DIGITS = re.compile(r'\d+')
+
+# Matrices already loaded in this process, keyed by absolute JSON path
+_loaded_matrices: Dict[str, 'DocTermMatrix'] = {}
+
+def dtm_path_for(json_file: str) -> str:
+    """Return the directory that caches the matrix of a JSON file."""
+    return os.path.splitext(json_file)[0] + '.dtm'
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words with digits removed, as in word_analysis.clean_text(text).split()."""
+    words = (DIGITS.sub('', word) for word in WORD_PATTERN.findall(text.lower()))
+    return [word for word in words if word]
+
+class DocTermMatrix:
+    """Word counts of every paper as CSR arrays (indptr, indices, data) over vocab."""
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray,
+                 vocab: np.ndarray, meta: dict):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.vocab = vocab
+        self.numbers: List[int] = meta['numbers']
+        self.authors: List[str] = meta['authors']
+        self.tags: List[List[str]] = meta['tags']
+        self.signature = meta.get('signature')
+        self._rows = {number: row for row, number in enumerate(self.numbers)}
+        self._lengths = None
+
+    @classmethod
+    def build(cls, papers: List[dict], signature=None) -> 'DocTermMatrix':
+        """Tokenize every paper once and count each (paper, word) pair."""
+        tokens = []
+        lengths = []
+        for paper in papers:
+            paper_tokens = tokenize(paper['text'])
+            tokens.extend(paper_tokens)
+            lengths.append(len(paper_tokens))
+
+        vocab, ids = np.unique(np.array(tokens, dtype=str), return_inverse=True)
+        rows = np.repeat(np.arange(len(papers), dtype=np.int64), lengths)
+        # Keys sort by row, then by word id, which is CSR order
+        keys, counts = np.unique(rows * max(len(vocab), 1) + ids.reshape(-1), return_counts=True)
+        key_rows = keys // max(len(vocab), 1)
+        indptr = np.zeros(len(papers) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(key_rows, minlength=len(papers)), out=indptr[1:])
+
+        meta = {
+            'numbers': [paper['number'] for paper in papers],
+            'authors': [paper.get('author', '') for paper in papers],
+            'tags': [list(paper.get('tags', [])) for paper in papers],
+            'signature': signature,
+        }
+        return cls(indptr, (keys % max(len(vocab), 1)).astype(np.int32),
+                   counts.astype(np.int32), vocab, meta)
+
+    def save(self, path: str):
+        """Write the arrays to path; meta.json is written last and marks the matrix complete."""
+        os.makedirs(path, exist_ok=True)
+        for name in ('indptr', 'indices', 'data', 'vocab'):
+            tmp_path = os.path.join(path, name + '.npy.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.save(f, getattr(self, name))
+            os.replace(tmp_path, os.path.join(path, name + '.npy'))
+        meta = {
+            'version': DTM_VERSION,
+            'numbers': self.numbers,
+            'authors': self.authors,
+            'tags': self.tags,
+            'signature': self.signature,
+        }
+        tmp_path = os.path.join(path, 'meta.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(path, 'meta.json'))
+
+    @classmethod
+    def load(cls, path: str) -> Optional['DocTermMatrix']:
+        """Memory-map a saved matrix, returning None if it is missing or outdated."""
+        try:
+            with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != DTM_VERSION:
+                return None
+            arrays = [np.load(os.path.join(path, name + '.npy'), mmap_mode='r')
+                      for name in ('indptr', 'indices', 'data', 'vocab')]
+        except (OSError, ValueError):
+            return None
+        return cls(*arrays, meta)
+
+    @property
+    def word_lengths(self) -> np.ndarray:
+        if self._lengths is None:
+            self._lengths = np.char.str_len(np.asarray(self.vocab))
+        return self._lengths
+
+    def rows_for(self, numbers: Optional[Iterable[int]] = None, author: Optional[str] = None) -> List[int]:
+        """Rows of the given paper numbers and/or author (case-insensitive); all rows by default."""
+        rows = range(len(self.numbers)) if numbers is None else [self._rows[n] for n in numbers if n in self._rows]
+        if author is not None:
+            rows = [row for row in rows if self.authors[row].lower() == author.lower()]
+        return list(rows)
+
+    def counts(self, rows: Optional[List[int]] = None) -> np.ndarray:
+        """Total count of every vocabulary word over the given rows (all rows by default)."""
+        if rows is None:
+            indices, data = self.indices, self.data
+        else:
+            indices = np.concatenate([self.indices[self.indptr[r]:self.indptr[r + 1]] for r in rows] or [[]])
+            data = np.concatenate([self.data[self.indptr[r]:self.indptr[r + 1]] for r in rows] or [[]])
+        return np.bincount(indices.astype(np.int64), weights=data, minlength=len(self.vocab)).astype(np.int64)
+
+    def groups(self, by: str) -> Dict[str, List[int]]:
+        """
+        Rows of each group when papers are grouped by 'author', 'paper' or
+        'tag'. A paper belongs to every one of its tags.
+        """
+        groups: Dict[str, List[int]] = {}
+        for row, number in enumerate(self.numbers):
+            if by == 'author':
+                keys = [self.authors[row]]
+            elif by == 'paper':
+                keys = [str(number)]
+            elif by == 'tag':
+                keys = self.tags[row]
+            else:
+                raise ValueError(f"Unknown grouping: {by}")
+            for key in keys:
+                groups.setdefault(key, []).append(row)
+        # Papers stay in corpus order; authors and tags are listed alphabetically
+        return groups if by == 'paper' else dict(sorted(groups.items()))
+
+    def group_counts(self, groups: Dict[str, List[int]]) -> np.ndarray:
+        """Dense (groups x vocabulary) matrix of word counts, in the order of groups."""
+        pair_rows = np.array([row for rows in groups.values() for row in rows], dtype=np.int64)
+        pair_groups = np.repeat(np.arange(len(groups)), [len(rows) for rows in groups.values()])
+        # Expand each (row, group) pair to the nonzero entries of its row
+        starts = np.asarray(self.indptr)[pair_rows]
+        lengths = np.asarray(self.indptr)[pair_rows + 1] - starts
+        entry_pairs = np.repeat(np.arange(len(pair_rows)), lengths)
+        entries = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        keys = pair_groups[entry_pairs] * len(self.vocab) + np.asarray(self.indices)[entries]
+        counts = np.bincount(keys, weights=np.asarray(self.data)[entries],
+                             minlength=len(groups) * len(self.vocab))
+        return counts.astype(np.int64).reshape(len(groups), len(self.vocab))
+
+    def content_mask(self, stop_words, min_length: int) -> np.ndarray:
+        """Vocabulary mask of words that are not stop words and at least min_length long."""
+        stop = np.isin(self.vocab, np.array(sorted(stop_words), dtype=str))
+        return ~stop & (self.word_lengths >= min_length)
+
+    def top_words(self, counts: np.ndarray, top_n: int, mask: Optional[np.ndarray] = None) -> List[Tuple[str, int]]:
+        """The top_n (word, count) pairs by count; only the selected top is sorted."""
+        if top_n <= 0:
+            return []
+        if mask is not None:
+            counts = np.where(mask, counts, 0)
+        candidates = np.flatnonzero(counts)
+        if top_n < len(candidates):
+            # Keep everything tied with the n-th count so ties break the same way every time
+            part = np.argpartition(-counts[candidates], top_n - 1)
+            cutoff = counts[candidates[part[top_n - 1]]]
+            candidates = candidates[counts[candidates] >= cutoff]
+        # Highest count first, ties alphabetically
+        order = np.lexsort((candidates, -counts[candidates]))[:top_n]
+        return [(str(self.vocab[i]), int(counts[i])) for i in candidates[order]]
+
+def get_matrix(json_file: str = 'fp_tagged.json') -> DocTermMatrix:
+    """
+    Return the matrix for json_file, loading it at most once per process and
+    rebuilding the on-disk copy whenever the source JSON has changed.
+    """
+    key = os.path.abspath(json_file)
+    signature = source_signature(json_file)
+    if signature is None:
+        raise FileNotFoundError(json_file)
+    signature = list(signature)
+
+    matrix = _loaded_matrices.get(key)
+    if matrix is not None and matrix.signature == signature:
+        return matrix
+
+    path = dtm_path_for(json_file)
+    matrix = DocTermMatrix.load(path)
+    if matrix is None or matrix.signature != signature:
+        papers = [get_corpus(json_file).get_paper(number) for number in get_corpus(json_file).papers]
+        matrix = DocTermMatrix.build(papers, signature)
+        try:
+            matrix.save(path)
+        except OSError as e:
+            print(f"Warning: could not save document-term matrix to {path}: {e}")
+
+    _loaded_matrices[key] = matrix
+    return matrix
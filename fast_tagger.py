@@ -0,0 +1,339 @@
+"""
+Topic tagging without a language model.
+
+A one-vs-rest logistic regression over TF-IDF features of the content words
+is trained on the LLM tags already in fp_tagged.json. Tagging a paper is one
+matrix product, so the whole corpus is tagged in milliseconds on CPU.
+Predictions whose confidence is low can be handed back to the LLM tagger
+(add_tags.py --fast --fallback). What counts as confident is calibrated by
+cross-validation when the model is trained.
+
+Only tags written by the LLM are learned from: papers tagged by this
+classifier are marked with "tag_source": "fast_tagger" and skipped. The
+saved model records a hash of its training data and is retrained when
+that data changes.
+
+Usage:
+    python fast_tagger.py train           # fit on fp_tagged.json and save the model
+    python fast_tagger.py report          # cross-validated agreement with the LLM tags
+    python fast_tagger.py tag 10 51       # print predicted tags for some papers
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from corpus import get_corpus
+from doc_term_matrix import tokenize
+from word_analysis import STOP_WORDS
+
+MODEL_PATH = 'fast_tagger.npz'
+MODEL_VERSION = 3
+# Marks papers tagged by this classifier so they are never trained on
+TAG_SOURCE = 'fast_tagger'
+MIN_TAGS = 3
+MAX_TAGS = 5
+THRESHOLD = 0.5
+# A prediction is confident when every chosen tag is at least a calibrated margin
+# from 0.5: the smallest margin at which at least MIN_CONFIDENT held-out
+# predictions reach this precision, the share of chosen tags the LLM also chose
+TARGET_PRECISION = 0.8
+MIN_CONFIDENT = 5
+# Words must appear in at least this many training papers to become features
+MIN_DF = 2
+L2 = 1e-4
+EPOCHS = 500
+LEARNING_RATE = 20.0
+# The LLM tags were chosen from the start of each paper (add_tags.build_tags_prompt),
+# so the classifier reads the same excerpt
+EXCERPT_CHARS = 1000
+
+def content_tokens(text: str) -> List[str]:
+    return [word for word in tokenize(text) if word not in STOP_WORDS and len(word) >= 3]
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -30, 30)))
+
+def choose_indices(probabilities: np.ndarray) -> List[int]:
+    """
+    Label indices of MIN_TAGS to MAX_TAGS tags: everything over THRESHOLD,
+    topped up with the most probable tags.
+    """
+    order = np.argsort(-probabilities)
+    chosen = [i for i in order[:MAX_TAGS] if probabilities[i] >= THRESHOLD]
+    return (chosen + [i for i in order if i not in chosen])[:max(len(chosen), MIN_TAGS)]
+
+def margin(probabilities: np.ndarray, chosen: List[int]) -> float:
+    """Distance from THRESHOLD of the least certain chosen tag."""
+    return float(min(abs(probabilities[i] - THRESHOLD) for i in chosen))
+
+def tag_precision(truth: List[str], predicted: List[str]) -> float:
+    """Share of the predicted tags that are in truth."""
+    return len(set(truth) & set(predicted)) / len(predicted) if predicted else 1.0
+
+def jaccard(truth: List[str], predicted: List[str]) -> float:
+    union = set(truth) | set(predicted)
+    return len(set(truth) & set(predicted)) / len(union) if union else 1.0
+
+def training_signature(texts: List[str], tags: List[List[str]]) -> str:
+    """Hash of the training data and model version, stored with the model."""
+    data = json.dumps([MODEL_VERSION, texts, tags], ensure_ascii=False)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+class FastTagger:
+    """TF-IDF features plus one logistic regression per tag."""
+
+    def __init__(self, vocab: np.ndarray, idf: np.ndarray, weights: np.ndarray,
+                 bias: np.ndarray, labels: List[str], confident_margin: float = np.inf,
+                 signature: str = ''):
+        self.vocab = vocab
+        self.idf = idf
+        self.weights = weights  # vocabulary x labels
+        self.bias = bias
+        self.labels = labels
+        # No prediction is confident until the margin has been calibrated
+        self.confident_margin = confident_margin
+        self.signature = signature
+
+    @staticmethod
+    def _vectorize(texts: List[str], vocab: np.ndarray, idf: np.ndarray) -> np.ndarray:
+        """Dense l2-normalized sublinear TF-IDF rows of texts over vocab."""
+        features = np.zeros((len(texts), len(vocab)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = np.array(content_tokens(text[:EXCERPT_CHARS]), dtype=str)
+            if not len(tokens) or not len(vocab):
+                continue
+            positions = np.minimum(np.searchsorted(vocab, tokens), len(vocab) - 1)
+            ids, counts = np.unique(positions[vocab[positions] == tokens], return_counts=True)
+            features[row, ids] = (1 + np.log(counts)) * idf[ids]
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        return features / np.where(norms > 0, norms, 1)
+
+    @classmethod
+    def train(cls, texts: List[str], tags: List[List[str]], labels: Optional[List[str]] = None) -> 'FastTagger':
+        """Fit the vocabulary, IDF weights and one logistic regression per tag."""
+        labels = labels or sorted({tag for paper_tags in tags for tag in paper_tags})
+        documents = [set(content_tokens(text[:EXCERPT_CHARS])) for text in texts]
+        vocab, df = np.unique(np.array([word for words in documents for word in words], dtype=str),
+                              return_counts=True)
+        keep = df >= min(MIN_DF, len(texts))
+        vocab, df = vocab[keep], df[keep]
+        idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        features = cls._vectorize(texts, vocab, idf)
+
+        targets = np.array([[label in paper_tags for label in labels] for paper_tags in tags], dtype=np.float32)
+        weights = np.zeros((len(vocab), len(labels)), dtype=np.float32)
+        # Start each tag at its base rate
+        base_rate = np.clip(targets.mean(axis=0), 1e-3, 1 - 1e-3)
+        bias = np.log(base_rate / (1 - base_rate)).astype(np.float32)
+        # Full-batch gradient descent on every tag at once
+        for _ in range(EPOCHS):
+            error = _sigmoid(features @ weights + bias) - targets
+            weights -= LEARNING_RATE * (features.T @ error / len(texts) + L2 * weights)
+            bias -= LEARNING_RATE * error.mean(axis=0)
+        return cls(vocab, idf, weights, bias, labels)
+
+    def probabilities(self, texts: List[str]) -> np.ndarray:
+        """Probability of every tag for every text (texts x labels)."""
+        return _sigmoid(self._vectorize(texts, self.vocab, self.idf) @ self.weights + self.bias)
+
+    def choose(self, probabilities: np.ndarray) -> Tuple[List[str], bool]:
+        """
+        Pick MIN_TAGS to MAX_TAGS tags: everything over THRESHOLD, topped up
+        with the most probable tags. Returns (tags, confident).
+        """
+        chosen = choose_indices(probabilities)
+        confident = margin(probabilities, chosen) >= self.confident_margin
+        return [self.labels[i] for i in chosen], confident
+
+    def tag(self, texts: List[str]) -> List[Tuple[List[str], bool]]:
+        """(tags, confident) for every text."""
+        return [self.choose(row) for row in self.probabilities(texts)]
+
+    def save(self, path: str = MODEL_PATH):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, version=np.array(MODEL_VERSION), signature=np.array(self.signature),
+                     vocab=self.vocab, idf=self.idf, weights=self.weights, bias=self.bias,
+                     labels=np.array(self.labels, dtype=str),
+                     confident_margin=np.array(self.confident_margin))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def fit(cls, texts: List[str], tags: List[List[str]]) -> 'FastTagger':
+        """Train on all papers and calibrate the confidence margin by cross-validation."""
+        labels = sorted({tag for paper_tags in tags for tag in paper_tags})
+        tagger = cls.train(texts, tags, labels)
+        tagger.confident_margin = calibrate_margin(cross_validated_probabilities(texts, tags, labels), tags, labels)
+        tagger.signature = training_signature(texts, tags)
+        return tagger
+
+    @classmethod
+    def load(cls, path: str = MODEL_PATH) -> Optional['FastTagger']:
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != MODEL_VERSION:
+                    return None
+                return cls(data['vocab'], data['idf'], data['weights'], data['bias'], data['labels'].tolist(),
+                           float(data['confident_margin']), str(data['signature']))
+        except (OSError, KeyError, ValueError):
+            return None
+
+def training_data(json_file: str = 'fp_tagged.json') -> Tuple[List[int], List[str], List[List[str]]]:
+    """(numbers, texts, tags) of every paper tagged by the LLM."""
+    corpus = get_corpus(json_file)
+    papers = [paper for paper in corpus.sorted_papers()
+              if paper.get('tags') and paper.get('tag_source') != TAG_SOURCE]
+    return [paper['number'] for paper in papers], [paper['text'] for paper in papers], [paper['tags'] for paper in papers]
+
+def get_tagger(json_file: str = 'fp_tagged.json', path: str = MODEL_PATH) -> FastTagger:
+    """
+    Load the saved model, training and saving it first if there is none or
+    the LLM-tagged papers in json_file have changed since it was trained.
+    """
+    _, texts, tags = training_data(json_file)
+    if not texts:
+        raise ValueError(f"No LLM-tagged papers in {json_file} to train on")
+    tagger = FastTagger.load(path)
+    if tagger is None or tagger.signature != training_signature(texts, tags):
+        tagger = FastTagger.fit(texts, tags)
+        tagger.save(path)
+    return tagger
+
+def cross_validated_probabilities(texts: List[str], tags: List[List[str]], labels: List[str],
+                                  folds: int = 5) -> np.ndarray:
+    """Tag probabilities of every paper from a model trained without it (k-fold)."""
+    probabilities = np.zeros((len(texts), len(labels)), dtype=np.float32)
+    fold_of = np.random.default_rng(0).permutation(len(texts)) % folds
+    for fold in range(min(folds, len(texts))):
+        train = np.flatnonzero(fold_of != fold)
+        test = np.flatnonzero(fold_of == fold)
+        if not len(train) or not len(test):
+            continue
+        tagger = FastTagger.train([texts[i] for i in train], [tags[i] for i in train], labels)
+        probabilities[test] = tagger.probabilities([texts[i] for i in test])
+    return probabilities
+
+def calibrate_margin(probabilities: np.ndarray, tags: List[List[str]], labels: List[str]) -> float:
+    """
+    The smallest margin whose held-out (cross-validated) predictions at or
+    above it reach TARGET_PRECISION over at least MIN_CONFIDENT papers, or
+    infinity (nothing is confident) if no margin does.
+    """
+    margins, correct, chosen_counts = [], [], []
+    for row, paper_tags in zip(probabilities, tags):
+        chosen = choose_indices(row)
+        margins.append(margin(row, chosen))
+        correct.append(sum(labels[i] in paper_tags for i in chosen))
+        chosen_counts.append(len(chosen))
+    order = np.argsort(margins)[::-1]
+    # Tag precision of the k most certain predictions together, for every k
+    running = np.cumsum(np.array(correct)[order]) / np.maximum(np.cumsum(np.array(chosen_counts)[order]), 1)
+    reaching = [k for k in range(MIN_CONFIDENT, len(order) + 1) if running[k - 1] >= TARGET_PRECISION]
+    return float(margins[order[max(reaching) - 1]]) if reaching else float('inf')
+
+def agreement_report(texts: List[str], tags: List[List[str]], folds: int = 5) -> Dict[str, object]:
+    """
+    Agreement of the fast tagger with the LLM tags, each paper predicted by a
+    model trained without it (k-fold cross-validation).
+    """
+    labels = sorted({tag for paper_tags in tags for tag in paper_tags})
+    probabilities = cross_validated_probabilities(texts, tags, labels, folds)
+    predicted = [[labels[i] for i in choose_indices(row)] for row in probabilities]
+    confident_margin = calibrate_margin(probabilities, tags, labels)
+    confident_mask = np.array([margin(row, choose_indices(row)) >= confident_margin for row in probabilities])
+
+    truth = np.array([[label in paper_tags for label in labels] for paper_tags in tags])
+    guess = np.array([[label in paper_tags for label in labels] for paper_tags in predicted])
+    true_positive = (truth & guess).sum(axis=0)
+    precision = true_positive.sum() / max(guess.sum(), 1)
+    recall = true_positive.sum() / max(truth.sum(), 1)
+    scores = np.array([jaccard(truth_tags, guess_tags) for truth_tags, guess_tags in zip(tags, predicted)])
+    guess_precision = np.array([tag_precision(truth_tags, guess_tags) for truth_tags, guess_tags in zip(tags, predicted)])
+    per_tag = {label: 2 * true_positive[i] / max(truth[:, i].sum() + guess[:, i].sum(), 1)
+               for i, label in enumerate(labels)}
+    return {
+        'papers': len(texts),
+        'precision': float(precision),
+        'recall': float(recall),
+        'f1': float(2 * precision * recall / max(precision + recall, 1e-9)),
+        'jaccard': float(scores.mean()),
+        'exact': float((truth == guess).all(axis=1).mean()),
+        'confident_margin': confident_margin,
+        'confident': int(confident_mask.sum()),
+        'confident_precision': float(guess_precision[confident_mask].mean()) if confident_mask.any() else 0.0,
+        'confident_jaccard': float(scores[confident_mask].mean()) if confident_mask.any() else 0.0,
+        'per_tag_f1': {label: float(score) for label, score in per_tag.items()},
+    }
+
+def print_report(report: Dict[str, object]):
+    print(f"\nAgreement with the LLM tags ({report['papers']} papers, 5-fold cross-validation):")
+    print("-" * 50)
+    print(f"Micro precision: {report['precision']:.1%}")
+    print(f"Micro recall:    {report['recall']:.1%}")
+    print(f"Micro F1:        {report['f1']:.1%}")
+    print(f"Mean Jaccard:    {report['jaccard']:.1%}")
+    print(f"Identical tag sets: {report['exact']:.1%}")
+    if report['confident']:
+        print(f"Confident predictions (margin >= {report['confident_margin']:.3f}): "
+              f"{report['confident']} papers, precision {report['confident_precision']:.1%}, "
+              f"mean Jaccard {report['confident_jaccard']:.1%}")
+    else:
+        print(f"Confident predictions: none reach {TARGET_PRECISION:.0%} precision; "
+              f"--fallback sends every paper to the LLM")
+    print("\nF1 per tag:")
+    for label, score in sorted(report['per_tag_f1'].items(), key=lambda x: x[1], reverse=True):
+        print(f"{label:<26} {score:.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Tag the Federalist Papers with a local classifier trained on the LLM tags.')
+    parser.add_argument('command', choices=['train', 'report', 'tag'],
+                        help='train the model, report agreement with the LLM tags, or tag papers')
+    parser.add_argument('papers', type=int, nargs='*',
+                        help='Paper numbers to tag with the tag command (default: all)')
+    parser.add_argument('--json', default='fp_tagged.json',
+                        help='Tagged papers to train on (default: fp_tagged.json)')
+    parser.add_argument('--model', default=MODEL_PATH,
+                        help=f'Model file (default: {MODEL_PATH})')
+    args = parser.parse_args()
+
+    try:
+        numbers, texts, tags = training_data(args.json)
+    except FileNotFoundError:
+        print(f"Error: {args.json} not found. Please run add_tags.py first.")
+        sys.exit(1)
+    if not texts:
+        print(f"Error: no LLM-tagged papers in {args.json}.")
+        sys.exit(1)
+
+    if args.command == 'train':
+        start_time = time.time()
+        tagger = FastTagger.fit(texts, tags)
+        tagger.save(args.model)
+        print(f"Trained on {len(texts)} papers ({len(tagger.vocab)} features, {len(tagger.labels)} tags) "
+              f"in {time.time() - start_time:.2f} seconds; saved to {args.model}")
+        if np.isfinite(tagger.confident_margin):
+            print(f"Predictions are confident at margin >= {tagger.confident_margin:.3f}")
+        else:
+            print(f"Warning: no margin reaches {TARGET_PRECISION:.0%} precision in cross-validation; "
+                  f"no prediction is confident")
+    elif args.command == 'report':
+        print_report(agreement_report(texts, tags))
+    else:
+        tagger = get_tagger(args.json, args.model)
+        corpus = get_corpus(args.json)
+        wanted = args.papers or [paper['number'] for paper in corpus.sorted_papers()]
+        papers = [corpus.get_paper(number) for number in wanted if corpus.get(number) is not None]
+        start_time = time.time()
+        results = tagger.tag([paper['text'] for paper in papers])
+        elapsed = time.time() - start_time
+        for paper, (paper_tags, confident) in zip(papers, results):
+            marker = '' if confident else '  (low confidence)'
+            print(f"Federalist No. {paper['number']}: {', '.join(paper_tags)}{marker}")
+        print(f"\nTagged {len(papers)} papers in {elapsed * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
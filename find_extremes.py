@@ -1,10 +1,10 @@
-import pandas as pd
-import json
+from corpus import get_corpus
+from stats_engine import load_statistics
 
 def find_extreme_papers():
     """Find and display the longest and shortest Federalist Papers"""
     # Read statistics
-    df = pd.read_csv('statistics.csv')
+    df = load_statistics()
     
     # Find extremes by word count
     longest_by_words = df.loc[df['Word Count'].idxmax()]
@@ -15,10 +15,7 @@ def find_extreme_papers():
     shortest_by_chars = df.loc[df['Character Count'].idxmin()]
     
     # Get full paper content from fp_tagged.json
-    with open('fp_tagged.json', 'r') as f:
-        papers = json.load(f)
-    
-    paper_dict = {paper['number']: paper for paper in papers}
+    paper_dict = get_corpus('fp_tagged.json').papers
     
     # Print results
     print("\nLongest Paper by Word Count:")
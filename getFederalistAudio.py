@@ -1,58 +1,282 @@
-import json
+import argparse
+import hashlib
+import queue
 import sys
 import os
+import shutil
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional
 import pygame
-import ollama
-from getFederalistPaper import get_paper
-from time import sleep
+from getFederalistPaper import get_paper, get_papers, parse_paper_numbers
+from text_chunks import chunk_text
+from tts_backends import BACKENDS, TTSBackend, get_backend
 
-def text_to_speech(text: str, paper_number: int, model: str = "llama2") -> str:
+AUDIO_DIR = "audio"
+# Sentence-aligned chunks short enough that the first one is ready within a second or two
+CHUNK_CHARS = 400
+DEFAULT_WORKERS = os.cpu_count() or 4
+AUDIOBOOK_PATH = os.path.join(AUDIO_DIR, "federalist_papers.wav")
+# The RIFF size fields are 32-bit, so a WAV file holds at most 4 GiB of samples
+MAX_WAV_DATA_BYTES = 2**32 - 1 - 36
+
+def audio_hash(text: str, backend: TTSBackend) -> str:
+    """Hash of the text and the voice that speaks it; the audio cache key."""
+    return hashlib.sha256(f"{backend.cache_key()}\0{text}".encode('utf-8')).hexdigest()
+
+def audio_path_for(paper_number: int, digest: str) -> str:
+    """Return the cached WAV file of a paper's text."""
+    return os.path.join(AUDIO_DIR, f"federalist_{paper_number:02d}-{digest[:12]}.wav")
+
+def chunk_paths(chunk_dir: str, count: int) -> List[str]:
+    """Create chunk_dir and return the WAV path of each of its chunks."""
+    os.makedirs(chunk_dir, exist_ok=True)
+    return [os.path.join(chunk_dir, f"{i:04d}.wav") for i in range(count)]
+
+def synthesize_chunk(backend: TTSBackend, text: str, path: str):
+    """Synthesize one chunk to path, unless an earlier run already did."""
+    if os.path.exists(path):
+        return
+    tmp_path = path + '.tmp.wav'
+    backend.synthesize(text, tmp_path)
+    os.replace(tmp_path, path)
+
+def synthesize_chunks(chunks: List[str], backend: TTSBackend, chunk_dir: str,
+                      workers: int = DEFAULT_WORKERS) -> Iterator[str]:
+    """
+    Synthesize chunks in a worker pool, yielding the WAV path of each chunk in
+    order as soon as it is ready. Chunks already in chunk_dir are reused, so
+    an interrupted run picks up where it stopped.
+    """
+    paths = chunk_paths(chunk_dir, len(chunks))
+    pool = ThreadPoolExecutor(max_workers=workers if backend.parallel else 1)
+    try:
+        futures = [pool.submit(synthesize_chunk, backend, chunk, path) for chunk, path in zip(chunks, paths)]
+        for future, path in zip(futures, paths):
+            future.result()
+            yield path
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def concatenate_wavs(paths: List[str], output_path: str):
+    """
+    Join WAV files that share one format into output_path. Raises ValueError
+    before writing anything if the result would exceed the WAV size limit.
+    """
+    data_bytes = 0
+    for path in paths:
+        with wave.open(path, 'rb') as chunk:
+            data_bytes += chunk.getnframes() * chunk.getsampwidth() * chunk.getnchannels()
+    if data_bytes > MAX_WAV_DATA_BYTES:
+        raise ValueError(f"{output_path} would hold {data_bytes / 2**30:.1f} GiB of audio, more than a WAV "
+                         f"file can (4 GiB); select fewer papers or use --no-audiobook")
+    
+    tmp_path = output_path + '.tmp'
+    with wave.open(tmp_path, 'wb') as output:
+        for i, path in enumerate(paths):
+            with wave.open(path, 'rb') as chunk:
+                if i == 0:
+                    output.setparams(chunk.getparams())
+                output.writeframes(chunk.readframes(chunk.getnframes()))
+    os.replace(tmp_path, output_path)
+
+def text_to_speech(text: str, paper_number: int, backend: Optional[TTSBackend] = None,
+                   workers: int = DEFAULT_WORKERS, play: bool = False) -> str:
     """
-    Convert text to speech using Ollama and save as MP3.
+    Convert text to speech with a local TTS backend and save it as a WAV file,
+    synthesizing sentence-aligned chunks in parallel. With play=True, playback
+    starts as soon as the first chunk is ready.
     Returns the path to the saved audio file.
     """
-    # Create output directory if it doesn't exist
-    output_dir = "audio"
-    os.makedirs(output_dir, exist_ok=True)
+    backend = backend or get_backend()
+    digest = audio_hash(text, backend)
+    output_path = audio_path_for(paper_number, digest)
     
-    # Setup the output path
-    output_path = os.path.join(output_dir, f"federalist_{paper_number:02d}.mp3")
+    if os.path.exists(output_path):
+        print(f"Using cached audio: {output_path}")
+        if play:
+            play_audio(output_path)
+        return output_path
     
+    chunks = chunk_text(text, CHUNK_CHARS)
+    chunk_dir = os.path.join(AUDIO_DIR, '.chunks', digest)
     try:
-        print("Generating audio... This may take a moment.")
+        print(f"Generating audio with {backend.name}: {len(chunks)} chunks, {workers} workers")
+        start_time = time.time()
+        paths = synthesize_chunks(chunks, backend, chunk_dir, workers)
+        paths = play_stream(paths) if play else list(paths)
+        concatenate_wavs(paths, output_path)
+        shutil.rmtree(chunk_dir, ignore_errors=True)
         
-        # Request speech synthesis from Ollama
-        response = ollama.generate(
-            model=model,
-            prompt=f"Convert this text to speech and save as MP3: {text}"
-        )
-        
-        # TODO: Process Ollama's response to generate audio
-        # This will depend on which Ollama model you're using and its TTS capabilities
-        
-        print(f"Audio saved to: {output_path}")
+        print(f"Audio saved to: {output_path} ({time.time() - start_time:.1f} seconds)")
         return output_path
         
     except Exception as e:
         print(f"Error generating audio: {str(e)}")
         sys.exit(1)
 
+class PlaybackQueue:
+    """
+    Plays short WAV files (the synthesized chunks) in order on a background
+    thread, so add() returns at once. The thread blocks on the queue until a
+    file arrives, hands it to pygame's channel queue so consecutive files
+    play without a gap, and sleeps until the playing sound ends instead of
+    polling the mixer. Each file is decoded into memory, so whole papers go
+    through play_audio instead.
+    """
+    
+    def __init__(self):
+        self._paths: queue.Queue = queue.Queue()
+        self._stopped = threading.Event()
+        self.error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def add(self, path: str):
+        self._paths.put(path)
+    
+    def close(self):
+        """No more files will be added; playback ends after the last one."""
+        self._paths.put(None)
+    
+    def stop(self):
+        """Stop playback now."""
+        self._stopped.set()
+        self._paths.put(None)
+    
+    def wait(self):
+        """Block until every added file has played (or playback stopped)."""
+        self._thread.join()
+    
+    def _run(self):
+        try:
+            pygame.mixer.init()
+            channel = None
+            playing_until = 0.0  # time.monotonic() at which the playing sound ends
+            while True:
+                path = self._paths.get()
+                if path is None or self._stopped.is_set():
+                    break
+                sound = pygame.mixer.Sound(path)
+                now = time.monotonic()
+                if channel is None or now >= playing_until:
+                    channel = sound.play()
+                    playing_until = now + sound.get_length()
+                    continue
+                # Queue behind the playing sound and wake up when it ends
+                channel.queue(sound)
+                if self._stopped.wait(playing_until - now):
+                    break
+                playing_until += sound.get_length()
+            
+            self._stopped.wait(max(0.0, playing_until - time.monotonic()))
+            if channel is not None:
+                channel.stop()
+            pygame.mixer.quit()
+        except pygame.error as e:
+            self.error = e
+            print(f"Error playing audio: {str(e)}")
+
 def play_audio(audio_path: str):
-    """Play the audio file using pygame."""
+    """Play the audio file using pygame, streaming it from disk."""
     try:
         pygame.mixer.init()
-        pygame.mixer.music.load(audio_path)
-        pygame.mixer.music.play()
-        
-        # Wait for the audio to finish playing
-        while pygame.mixer.music.get_busy():
-            sleep(1)
+        try:
+            pygame.mixer.music.load(audio_path)
+            pygame.mixer.music.play()
             
-        pygame.mixer.quit()
-    except Exception as e:
+            # Wait for the audio to finish playing
+            while pygame.mixer.music.get_busy():
+                time.sleep(0.1)
+        finally:
+            # Also silences playback when interrupted with Ctrl+C
+            pygame.mixer.music.stop()
+            pygame.mixer.quit()
+    except pygame.error as e:
         print(f"Error playing audio: {str(e)}")
         print(f"The audio file is saved at: {audio_path}")
 
+def play_stream(paths: Iterable[str]) -> List[str]:
+    """
+    Play WAV files back to back as they arrive. Synthesis continues even if
+    playback fails; if synthesis fails or is interrupted, playback stops at
+    once. Returns every path in order.
+    """
+    player = PlaybackQueue()
+    played = []
+    try:
+        for path in paths:
+            played.append(path)
+            player.add(path)
+        player.close()
+        player.wait()
+    except BaseException:
+        player.stop()
+        raise
+    return played
+
+def render_papers(papers: List[dict], backend: TTSBackend, workers: int = DEFAULT_WORKERS,
+                  audiobook_path: Optional[str] = AUDIOBOOK_PATH) -> Dict[int, str]:
+    """
+    Render many papers to WAV files, then join them into one audiobook.
+    The chunks of every paper share one worker pool, so the rendering time
+    depends on the number of cores rather than the number of papers. Each
+    paper is written as soon as its last chunk is done.
+    Returns the audio file of every paper.
+    """
+    outputs = {}
+    jobs = {}
+    for paper in papers:
+        text = prepare_text_for_speech(paper)
+        digest = audio_hash(text, backend)
+        outputs[paper['number']] = audio_path_for(paper['number'], digest)
+        if not os.path.exists(outputs[paper['number']]):
+            chunks = chunk_text(text, CHUNK_CHARS)
+            chunk_dir = os.path.join(AUDIO_DIR, '.chunks', digest)
+            jobs[paper['number']] = (chunks, chunk_dir, chunk_paths(chunk_dir, len(chunks)))
+    
+    print(f"{len(papers) - len(jobs)} of {len(papers)} papers already rendered")
+    total_chunks = sum(len(chunks) for chunks, _, _ in jobs.values())
+    if jobs:
+        print(f"Rendering {len(jobs)} papers ({total_chunks} chunks) with {backend.name}, "
+              f"{workers if backend.parallel else 1} workers")
+    
+    start_time = time.time()
+    remaining = {number: len(chunks) for number, (chunks, _, _) in jobs.items()}
+    done_chunks = 0
+    # On a failure, chunks not yet started are cancelled instead of rendered
+    pool = ThreadPoolExecutor(max_workers=workers if backend.parallel else 1)
+    try:
+        futures = {pool.submit(synthesize_chunk, backend, chunk, path): number
+                   for number, (chunks, _, paths) in jobs.items()
+                   for chunk, path in zip(chunks, paths)}
+        for future in as_completed(futures):
+            future.result()
+            number = futures[future]
+            done_chunks += 1
+            remaining[number] -= 1
+            if remaining[number]:
+                continue
+            
+            _, chunk_dir, paths = jobs[number]
+            concatenate_wavs(paths, outputs[number])
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+            elapsed = time.time() - start_time
+            eta = elapsed / done_chunks * (total_chunks - done_chunks)
+            finished = len(jobs) - sum(1 for left in remaining.values() if left)
+            print(f"[{finished}/{len(jobs)}] Federalist No. {number} -> {outputs[number]} "
+                  f"({done_chunks}/{total_chunks} chunks, {elapsed:.1f}s elapsed, ~{eta:.0f}s left)")
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    
+    if audiobook_path:
+        concatenate_wavs([outputs[paper['number']] for paper in papers], audiobook_path)
+        print(f"Audiobook saved to: {audiobook_path}")
+    print(f"Rendered {len(jobs)} papers in {time.time() - start_time:.1f} seconds")
+    return outputs
+
 def prepare_text_for_speech(paper: dict) -> str:
     """Prepare the paper text for speech synthesis."""
     topics_text = f"Topics: {', '.join(paper['topics'])}. " if 'topics' in paper else ""
@@ -65,35 +289,68 @@ def prepare_text_for_speech(paper: dict) -> str:
     """
 
 def main():
-    # Check if a paper number was provided
-    if len(sys.argv) != 2:
-        print("Usage: python getFederalistAudio.py <paper_number>")
-        print("Example: python getFederalistAudio.py 10")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description='Read a Federalist Paper aloud with a local text-to-speech engine.')
+    parser.add_argument('paper_number', type=int, nargs='?', help='Paper to read, e.g. 10')
+    parser.add_argument('--batch', metavar='PAPERS',
+                        help='Render papers to audio files without playing them, e.g. 1-10, 10,51-58 or all')
+    parser.add_argument('--audiobook', default=AUDIOBOOK_PATH,
+                        help=f'With --batch, also join the papers into this file (default: {AUDIOBOOK_PATH})')
+    parser.add_argument('--no-audiobook', action='store_true',
+                        help='With --batch, write only the per-paper files')
+    parser.add_argument('--backend', choices=sorted(BACKENDS),
+                        help='TTS engine (default: the first installed of piper, espeak, pyttsx3)')
+    parser.add_argument('--voice', default=None,
+                        help='Voice name, or the .onnx voice file for piper')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Chunks synthesized in parallel (default: {DEFAULT_WORKERS})')
+    parser.add_argument('--no-play', action='store_true',
+                        help='Only write the audio file')
+    args = parser.parse_args()
+    
+    if (args.paper_number is None) == (args.batch is None):
+        parser.error('give either a paper number or --batch')
     
     try:
-        paper_number = int(sys.argv[1])
-    except ValueError:
-        print("Error: Please provide a valid paper number (integer)")
+        backend = get_backend(args.backend, args.voice)
+    except RuntimeError as e:
+        print(f"Error: {e}")
         sys.exit(1)
     
+    if args.batch is not None:
+        try:
+            numbers = parse_paper_numbers(args.batch)
+        except ValueError:
+            print(f"Error: invalid paper selection: {args.batch}")
+            sys.exit(1)
+        papers = get_papers(numbers)
+        missing = [number for number in numbers if number not in papers]
+        if missing:
+            print(f"Error: Federalist Papers not found: {', '.join(map(str, missing))}")
+            sys.exit(1)
+        try:
+            render_papers(list(papers.values()), backend, max(1, args.workers),
+                          None if args.no_audiobook else args.audiobook)
+        except Exception as e:
+            print(f"Error generating audio: {str(e)}")
+            sys.exit(1)
+        return
+    
     # Get the paper
-    paper = get_paper(paper_number)
+    paper = get_paper(args.paper_number)
     
     if paper is None:
-        print(f"Error: Federalist Paper #{paper_number} not found.")
+        print(f"Error: Federalist Paper #{args.paper_number} not found.")
         sys.exit(1)
     
     # Prepare text for speech
     speech_text = prepare_text_for_speech(paper)
     
-    # Convert to speech and get audio file path
-    audio_path = text_to_speech(speech_text, paper_number)
-    
-    # Play the audio
-    print("\nPlaying audio...")
-    play_audio(audio_path)
-    print("Audio playback completed.")
+    # Convert to speech, playing the chunks as they are synthesized
+    if not args.no_play:
+        print("\nPlaying audio...")
+    text_to_speech(speech_text, args.paper_number, backend, max(1, args.workers), play=not args.no_play)
+    if not args.no_play:
+        print("Audio playback completed.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,29 +1,18 @@
+import argparse
+import hashlib
 import json
 import sys
 import os
-import re
-
-def count_words(text):
-    """Count words in text"""
-    words = text.strip().split()
-    return len(words)
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from corpus import get_corpus
 
 def get_paper(number: int) -> dict:
     """Retrieve a specific Federalist Paper from the JSON file."""
     try:
-        with open('fp_tagged.json', 'r', encoding='utf-8') as f:
-            papers = json.load(f)
-            
-        # Find the paper with the specified number
-        for paper in papers:
-            if paper['number'] == number:
-                # Extract tags from text if they exist
-                tags = set(re.findall(r'#(\w+)', paper['text']))
-                if tags:
-                    paper['tags'] = list(tags)
-                # Add word count
-                paper['word_count'] = count_words(paper['text'])
-                return paper
+        # Look the paper up by number; tags and word count are filled in
+        return get_corpus('fp_tagged.json').get_paper(number)
                 
     except FileNotFoundError:
         print("Error: fp_tagged.json not found.")
@@ -31,62 +20,114 @@ def get_paper(number: int) -> dict:
     except json.JSONDecodeError:
         print("Error: Invalid JSON file")
         sys.exit(1)
-    
-    return None
+
+def get_papers(numbers: List[int]) -> Dict[int, dict]:
+    """Retrieve several Federalist Papers in one call, keyed by number; missing numbers are left out."""
+    try:
+        return get_corpus('fp_tagged.json').get_papers(numbers)
+    except FileNotFoundError:
+        print("Error: fp_tagged.json not found.")
+        sys.exit(1)
+    except json.JSONDecodeError:
+        print("Error: Invalid JSON file")
+        sys.exit(1)
+
+def all_paper_numbers() -> List[int]:
+    """Every paper number in the JSON file, sorted."""
+    try:
+        return get_corpus('fp_tagged.json').paper_numbers()
+    except FileNotFoundError:
+        print("Error: fp_tagged.json not found.")
+        sys.exit(1)
+    except json.JSONDecodeError:
+        print("Error: Invalid JSON file")
+        sys.exit(1)
+
+def parse_paper_numbers(spec: str) -> List[int]:
+    """
+    Parse a paper selection such as "10", "10-14", "1,10,51-58" or "all"
+    (every paper in the corpus) into sorted paper numbers. Raises ValueError
+    on malformed input.
+    """
+    if spec.strip().lower() == 'all':
+        return all_paper_numbers()
+    numbers = set()
+    for part in spec.split(','):
+        first, dash, last = part.strip().partition('-')
+        first_number = int(first)
+        last_number = int(last) if dash else first_number
+        if last_number < first_number:
+            raise ValueError(f"Empty range: {part.strip()}")
+        numbers.update(range(first_number, last_number + 1))
+    return sorted(numbers)
+
+def paper_txt_path(paper: dict, output_dir: str = "papers") -> str:
+    """Return the text file a paper is saved to."""
+    return os.path.join(output_dir, f"federalist_{paper['number']:02d}.txt")
+
+def format_paper_txt(paper: dict) -> str:
+    """The contents of a paper's text file: a short header and the text."""
+    lines = [
+        f"Federalist No. {paper['number']}\n",
+        f"Author: {paper['author']}\n",
+        f"Word Count: {paper['word_count']}\n",
+    ]
+    if 'topics' in paper:
+        lines.append(f"Topics: {', '.join(paper['topics'])}\n")
+    if 'tags' in paper:
+        lines.append(f"Tags: {', '.join(paper['tags'])}\n")
+    lines.append("=" * 50 + "\n\n")
+    lines.append(paper['text'])
+    return ''.join(lines)
 
 def save_paper_to_txt(paper: dict, output_dir: str = "papers"):
-    """Save the paper to a text file."""
+    """Save the paper to a text file, unless the file already holds it."""
     # Create the output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
-    filename = f"federalist_{paper['number']:02d}.txt"
-    filepath = os.path.join(output_dir, filename)
-    
-    # Check if file already exists
-    if os.path.exists(filepath):
-        print(f"\nFile already exists: {filepath}")
-        with open(filepath, 'r', encoding='utf-8') as f:
-            existing_content = f.read()
-            print("\nExisting content:")
-            print("=" * 50)
-            print(existing_content)
-        return filepath
-    
-    # If file doesn't exist, create it
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(f"Federalist No. {paper['number']}\n")
-        f.write(f"Author: {paper['author']}\n")
-        f.write(f"Word Count: {paper['word_count']}\n")
-        if 'topics' in paper:
-            f.write(f"Topics: {', '.join(paper['topics'])}\n")
-        if 'tags' in paper:
-            f.write(f"Tags: {', '.join(paper['tags'])}\n")
-        f.write("=" * 50 + "\n\n")
-        f.write(paper['text'])
-    
+    filepath = paper_txt_path(paper, output_dir)
+    write_if_changed(filepath, format_paper_txt(paper))
     return filepath
 
-def main():
-    # Check if a paper number was provided
-    if len(sys.argv) != 2:
-        print("Usage: python getFederalistPaper.py <paper_number>")
-        print("Example: python getFederalistPaper.py 10")
-        sys.exit(1)
-    
+def write_if_changed(filepath: str, content: str) -> bool:
+    """
+    Write content to filepath through a temporary file and an atomic rename,
+    unless the file already holds exactly that content. A size mismatch
+    decides without reading the file; otherwise the hashes are compared.
+    Returns True if the file was written.
+    """
+    data = content.encode('utf-8')
     try:
-        paper_number = int(sys.argv[1])
-    except ValueError:
-        print("Error: Please provide a valid paper number (integer)")
-        sys.exit(1)
-    
-    # Get the paper
-    paper = get_paper(paper_number)
-    
-    if paper is None:
-        print(f"Error: Federalist Paper #{paper_number} not found.")
-        sys.exit(1)
+        if os.path.getsize(filepath) == len(data):
+            with open(filepath, 'rb') as f:
+                if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                    return False
+    except FileNotFoundError:
+        pass
     
-    # Print to console
+    tmp_path = filepath + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, filepath)
+    return True
+
+def export_papers(papers: List[dict], output_dir: str = "papers", workers: int = 8) -> Dict[str, List[int]]:
+    """
+    Write the text file of every paper concurrently, rewriting only files
+    whose content changed. Returns the paper numbers that were 'written' and
+    those left 'unchanged'.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        written = list(pool.map(lambda paper: write_if_changed(paper_txt_path(paper, output_dir),
+                                                               format_paper_txt(paper)), papers))
+    return {
+        'written': [paper['number'] for paper, changed in zip(papers, written) if changed],
+        'unchanged': [paper['number'] for paper, changed in zip(papers, written) if not changed],
+    }
+
+def print_paper(paper: dict):
+    """Print a paper with its header to the console."""
     print(f"\nFederalist No. {paper['number']}")
     print(f"Author: {paper['author']}")
     print(f"Word Count: {paper['word_count']}")
@@ -96,11 +137,47 @@ def main():
         print(f"Tags: {', '.join(paper['tags'])}")
     print("=" * 50)
     print(f"\n{paper['text']}\n")
+
+def main():
+    parser = argparse.ArgumentParser(description='Print Federalist Papers and save them as text files.',
+                                     epilog='Examples: 10, 10-14, 1,10,51-58, all')
+    parser.add_argument('papers', help='Paper number, range or comma-separated list')
+    parser.add_argument('--export', action='store_true',
+                        help='Only write the text files, rewriting those whose content changed')
+    parser.add_argument('--output-dir', default='papers',
+                        help='Directory for the text files (default: papers)')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='Files written in parallel (default: 8)')
+    args = parser.parse_args()
+    
+    try:
+        numbers = parse_paper_numbers(args.papers)
+    except ValueError:
+        print("Error: Please provide a paper number (integer), a range such as 10-14 or a list such as 1,10,51")
+        sys.exit(1)
+    
+    # Get the papers
+    start_time = time.time()
+    papers = get_papers(numbers)
+    
+    missing = [number for number in numbers if number not in papers]
+    if len(missing) == len(numbers):
+        print(f"Error: Federalist Paper #{', #'.join(map(str, missing))} not found.")
+        sys.exit(1)
+    
+    if not args.export:
+        for paper in papers.values():
+            # Print to console
+            print_paper(paper)
+    
+    # Save to files, rewriting only those whose content changed
+    result = export_papers(list(papers.values()), args.output_dir, max(1, args.workers))
+    print(f"{'Exported' if args.export else 'Saved'} {len(papers)} papers to {args.output_dir}/ "
+          f"in {time.time() - start_time:.2f} seconds: "
+          f"{len(result['written'])} written, {len(result['unchanged'])} unchanged")
     
-    # Save to file
-    filepath = save_paper_to_txt(paper)
-    if not os.path.exists(filepath):
-        print(f"\nPaper has been saved to: {filepath}")
+    if missing:
+        print(f"Warning: Federalist Paper #{', #'.join(map(str, missing))} not found.")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List
+
+DEFAULT_MANIFEST_PATH = 'pipeline_manifest.json'
+
+def _digest(value) -> str:
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def source_hash(paper: dict) -> str:
+    """Hash of a paper as extracted from the PDF: its number, author and text."""
+    return _digest([paper['number'], paper['author'], paper['text']])
+
+def record_hash(paper: dict, *settings) -> str:
+    """Hash of a whole paper record plus any stage settings (model, prompt...) that shape its output."""
+    return _digest([paper, list(settings)])
+
+def inputs_hash(papers: List[dict], *settings) -> str:
+    """Hash of a stage's whole input and settings, used to match a journal to its run."""
+    return _digest([papers, list(settings)])
+
+class Manifest:
+    """
+    Per-stage record of the input hash each paper was processed from and the
+    hash of the record the stage wrote for it. A stage can reuse its previous
+    output for a paper when both still match.
+    """
+
+    def __init__(self, path: str = DEFAULT_MANIFEST_PATH):
+        self.path = path
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.stages = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.stages = {}
+
+    def reusable(self, stage: str, papers: List[dict], output_path: str, *settings) -> Dict[int, dict]:
+        """
+        Return the previous output record of every paper whose input is
+        unchanged since the stage last ran, keyed by number.
+        """
+        entries = self.stages.get(stage, {})
+        if not entries:
+            return {}
+        try:
+            with open(output_path, 'r', encoding='utf-8') as f:
+                previous = {paper['number']: paper for paper in json.load(f)}
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+        reused = {}
+        for paper in papers:
+            entry = entries.get(str(paper['number']))
+            output = previous.get(paper['number'])
+            if entry is None or output is None:
+                continue
+            # The output file may have been rewritten by something else since
+            if entry['input'] == record_hash(paper, *settings) and entry['output'] == record_hash(output):
+                reused[paper['number']] = output
+        return reused
+
+    def changed(self, stage: str, papers: List[dict], *settings) -> List[int]:
+        """Numbers of the papers whose input differs from the last run of the stage."""
+        entries = self.stages.get(stage, {})
+        return [paper['number'] for paper in papers
+                if entries.get(str(paper['number']), {}).get('input') != record_hash(paper, *settings)]
+
+    def record(self, stage: str, inputs: List[dict], outputs: List[dict], *settings,
+               failed: Iterable[int] = ()):
+        """
+        Record the input and output hash of every paper the stage wrote, then
+        save. Papers in failed are left out, so the next run processes them again.
+        """
+        by_number = {paper['number']: paper for paper in inputs}
+        failed = set(failed)
+        self.stages[stage] = {
+            str(output['number']): {
+                'input': record_hash(by_number[output['number']], *settings),
+                'output': record_hash(output)
+            }
+            for output in outputs if output['number'] in by_number and output['number'] not in failed
+        }
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.stages, f, indent=2)
+        os.replace(tmp_path, self.path)
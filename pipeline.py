@@ -0,0 +1,185 @@
+"""
+Run the Federalist Papers pipeline in dependency order.
+
+Each stage declares the files it reads and writes. A stage is skipped when
+all of its outputs exist and are newer than all of its inputs, make-style.
+Stages whose inputs are ready run concurrently, so the leaf reports (plots,
+extremes, compilation, topic matrix) build side by side.
+
+Usage:
+    python pipeline.py                   # bring every output up to date
+    python pipeline.py add_tags          # only what add_tags needs
+    python pipeline.py --dry-run         # list the stages that would run
+    python pipeline.py --force --jobs 2  # rerun everything, two stages at a time
+"""
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, NamedTuple, Optional
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+class Stage(NamedTuple):
+    name: str
+    command: List[str]
+    inputs: List[str]
+    outputs: List[str]
+
+# clean_authors writes an intermediate file so that process_federalist cleans
+# the text of the author-normalized papers instead of overwriting them
+STAGES = [
+    Stage('extract', ['processInput.py'],
+          ['5008_Federalist Papers.pdf'], ['federalist_papers.json']),
+    Stage('clean_authors', ['clean_authors.py', '--output', 'fp_authors.json'],
+          ['federalist_papers.json'], ['fp_authors.json']),
+    Stage('clean_text', ['process_federalist.py', '--input', 'fp_authors.json'],
+          ['fp_authors.json'], ['fp_edited.json']),
+    Stage('add_tags', ['add_tags.py'],
+          ['fp_edited.json'], ['fp_tagged.json']),
+    Stage('statistics', ['generate_statistics.py'],
+          ['fp_tagged.json'], ['statistics.csv', 'statistics.npz']),
+    Stage('extremes', ['find_extremes.py'],
+          ['statistics.npz', 'fp_tagged.json'], ['extreme_papers.txt']),
+    Stage('visualize', ['visualize_statistics.py'],
+          ['statistics.npz'], ['distributions.png', 'distribution_tables.txt']),
+    Stage('compilation', ['scripts/create_compilation.py'],
+          ['fp_tagged.json'], ['federalist_papers.md', 'federalist_papers.txt']),
+    Stage('topics', ['analyze_topics.py'],
+          ['federalist_papers.json'], ['topic_matrix.md']),
+]
+
+_print_lock = threading.Lock()
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(os.path.join(PROJECT_ROOT, path)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def is_stale(stage: Stage) -> bool:
+    """True if an output of the stage is missing or older than one of its inputs."""
+    output_times = [_mtime(path) for path in stage.outputs]
+    if None in output_times:
+        return True
+    input_times = [t for t in (_mtime(path) for path in stage.inputs) if t is not None]
+    return bool(input_times) and max(input_times) > min(output_times)
+
+def dependencies(stages: List[Stage]) -> Dict[str, List[str]]:
+    """Map each stage name to the names of the stages producing its inputs."""
+    producers = {path: stage.name for stage in stages for path in stage.outputs}
+    return {stage.name: sorted({producers[path] for path in stage.inputs if path in producers})
+            for stage in stages}
+
+def select_stages(stages: List[Stage], targets: List[str]) -> List[Stage]:
+    """Return the target stages and everything they depend on, in declaration order."""
+    if not targets:
+        return list(stages)
+    deps = dependencies(stages)
+    wanted = set()
+    todo = list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(deps[name])
+    return [stage for stage in stages if stage.name in wanted]
+
+def run_stage(stage: Stage) -> int:
+    """Run one stage, prefixing each line of its output with the stage name."""
+    process = subprocess.Popen(
+        [sys.executable, '-u'] + stage.command, cwd=PROJECT_ROOT,
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, encoding='utf-8', errors='replace')
+    for line in process.stdout:
+        with _print_lock:
+            print(f"[{stage.name}] {line}", end='')
+    return process.wait()
+
+def run_pipeline(stages: List[Stage], jobs: int, force: bool = False, dry_run: bool = False) -> Dict[str, tuple]:
+    """
+    Run the stages in dependency order, up to jobs at a time. A stage runs if
+    it is stale, forced, or one of its dependencies ran. Returns
+    {name: (status, seconds)} with status 'ran', 'skipped', 'failed' or 'blocked'.
+    """
+    deps = dependencies(stages)
+    selected = {stage.name for stage in stages}
+    waiting = {stage.name: stage for stage in stages}
+    results = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while waiting or running:
+            for name, stage in list(waiting.items()):
+                stage_deps = [dep for dep in deps[name] if dep in selected]
+                if any(dep not in results for dep in stage_deps):
+                    continue
+                del waiting[name]
+                if any(results[dep][0] in ('failed', 'blocked') for dep in stage_deps):
+                    results[name] = ('blocked', 0.0)
+                elif not (force or is_stale(stage) or any(results[dep][0] == 'ran' for dep in stage_deps)):
+                    results[name] = ('skipped', 0.0)
+                elif dry_run:
+                    results[name] = ('ran', 0.0)
+                    print(f"Would run {name}: python {' '.join(stage.command)}")
+                else:
+                    print(f"Starting {name}: python {' '.join(stage.command)}")
+                    running[pool.submit(run_stage, stage)] = (name, time.time())
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, started = running.pop(future)
+                try:
+                    status = 'ran' if future.result() == 0 else 'failed'
+                except Exception as e:
+                    print(f"Error running {name}: {str(e)}")
+                    status = 'failed'
+                results[name] = (status, time.time() - started)
+                print(f"Finished {name} ({status}) in {results[name][1]:.1f} seconds")
+    return results
+
+def print_timings(stages: List[Stage], results: Dict[str, tuple]):
+    print("\nStage timings:")
+    print("-" * 36)
+    for stage in stages:
+        status, seconds = results[stage.name]
+        print(f"{stage.name:<16}{status:<10}{seconds:>8.1f}s")
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the Federalist Papers pipeline, skipping up-to-date stages.')
+    parser.add_argument('targets', nargs='*',
+                        help=f"Stages to bring up to date, with their dependencies (default: all): "
+                             f"{', '.join(stage.name for stage in STAGES)}")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Maximum stages run at the same time (default: number of CPUs)')
+    parser.add_argument('--force', action='store_true',
+                        help='Run the selected stages even if their outputs are up to date')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only print the stages that would run')
+    args = parser.parse_args()
+
+    names = {stage.name for stage in STAGES}
+    unknown = [target for target in args.targets if target not in names]
+    if unknown:
+        print(f"Error: unknown stage(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    stages = select_stages(STAGES, args.targets)
+    start_time = time.time()
+    results = run_pipeline(stages, max(1, args.jobs), args.force, args.dry_run)
+
+    if not args.dry_run:
+        print_timings(stages, results)
+        print(f"\nTotal time: {time.time() - start_time:.1f} seconds")
+
+    failed = [name for name, (status, _) in results.items() if status in ('failed', 'blocked')]
+    if failed:
+        print(f"\nStages that did not complete: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,116 +1,171 @@
 import PyPDF2
 import json
+import os
 import re
 import argparse
-from typing import Dict, List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Tuple
+from binary_corpus import binary_path_for, write_binary_corpus
+from manifest import Manifest, source_hash
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract all text from the PDF file."""
+HEADER_PATTERN = re.compile(r'FEDERALIST\s+\d+|FEDERALIST\.?\s+No\.\s+\d+')
+
+def _extract_page_range(task: Tuple[str, int, int]) -> List[str]:
+    """Extract the text of pages [start, stop) in a worker process."""
+    pdf_path, start, stop = task
+    with open(pdf_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[i].extract_text() for i in range(start, stop)]
+
+def iter_pdf_pages(pdf_path: str, workers: int = None, pages_per_task: int = None) -> Iterator[str]:
+    """
+    Yield the text of each page in order, extracted by a pool of worker
+    processes. Only a bounded number of page ranges are in flight at a time.
+    """
     try:
         with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            print(f"Successfully opened PDF. Number of pages: {len(pdf_reader.pages)}")
-            text = ''
-            for page in pdf_reader.pages:
-                text += page.extract_text() + '\n'
-            return text
+            total_pages = len(PyPDF2.PdfReader(file).pages)
     except Exception as e:
         print(f"Error reading PDF: {str(e)}")
         raise
+    print(f"Successfully opened PDF. Number of pages: {total_pages}")
+    
+    workers = workers or os.cpu_count() or 1
+    pages_per_task = pages_per_task or max(1, min(16, -(-total_pages // (workers * 4))))
+    tasks = [(pdf_path, start, min(start + pages_per_task, total_pages))
+             for start in range(0, total_pages, pages_per_task)]
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        task_iter = iter(tasks)
+        for task in islice(task_iter, workers * 2):
+            pending.append(pool.submit(_extract_page_range, task))
+        while pending:
+            pages = pending.popleft().result()
+            for task in islice(task_iter, 1):
+                pending.append(pool.submit(_extract_page_range, task))
+            yield from pages
 
-def parse_federalist_papers(text: str, test_limit: int = None) -> List[Dict]:
-    """Parse the text into individual Federalist Papers."""
-    papers = []
+def extract_text_from_pdf(pdf_path: str, workers: int = None) -> str:
+    """Extract all text from the PDF file."""
+    return ''.join(page + '\n' for page in iter_pdf_pages(pdf_path, workers))
+
+def build_paper(number: int, text_content: str) -> Dict:
+    """Build a paper entry from the raw text that follows its header."""
+    text_content = text_content.strip()
+    
+    # Try to extract author
+    author_match = re.search(r'by\s+([\w\s]+)\s*\n', text_content)
+    author = author_match.group(1).strip() if author_match else "Unknown"
     
-    # Split text into individual papers using a more specific pattern
-    paper_splits = re.split(r'(FEDERALIST\s+\d+|FEDERALIST\.?\s+No\.\s+\d+)', text)
+    # Clean up the text
+    if author_match:
+        text_content = text_content.replace(author_match.group(0), '')
     
-    current_paper = None
-    current_number = None
+    # Remove PUBLIUS signature
+    text_content = re.sub(r'\s*PUBLIUS\s*$', '', text_content)
     
+    # Remove any footnotes (assuming they start with numbers in parentheses)
+    text_content = re.sub(r'\(\d+\)[^\n]*\n', '', text_content)
+    
+    # Clean up extra whitespace
+    text_content = re.sub(r'\s+', ' ', text_content)
+    text_content = text_content.strip()
+    
+    # Create the paper entry
+    paper = {
+        "number": number,
+        "author": author,
+        "text": text_content
+    }
+    paper["source_hash"] = source_hash(paper)
+    return paper
+
+def iter_federalist_papers(chunks: Iterable[str]) -> Iterator[Dict]:
+    """
+    Parse a stream of text chunks (e.g. pages) into individual Federalist
+    Papers, yielding each paper as soon as the next `FEDERALIST No. N` header
+    closes it. Only the text of the paper being read is buffered.
+    """
+    buffer = ''
     print("\nParsing papers...")
     
-    for i, split in enumerate(paper_splits):
-        if not split.strip():
+    for chunk in chunks:
+        buffer += chunk
+        header = HEADER_PATTERN.search(buffer)
+        if header is None:
+            # Keep only what could be the start of a header split across pages
+            keep_from = buffer.rfind('FEDERALIST')
+            buffer = buffer[keep_from:] if keep_from >= 0 else buffer[-len('FEDERALIST'):]
             continue
-            
-        if re.match(r'FEDERALIST\s+\d+|FEDERALIST\.?\s+No\.\s+\d+', split):
-            # If we have a previous paper, save it
-            if current_paper is not None:
-                papers.append(current_paper)
-                if test_limit and len(papers) >= test_limit:
-                    break
-            
-            # Extract paper number
-            number_match = re.search(r'\d+', split)
-            if number_match:
-                current_number = int(number_match.group())
-                print(f"Processing paper number {current_number}")
-            else:
-                current_number = None
-            current_paper = None
-        else:
-            if current_number is None:
-                continue
-                
-            text_content = split.strip()
-            
-            # Try to extract author
-            author_match = re.search(r'by\s+([\w\s]+)\s*\n', text_content)
-            author = author_match.group(1).strip() if author_match else "Unknown"
-            
-            # Clean up the text
-            if author_match:
-                text_content = text_content.replace(author_match.group(0), '')
-            
-            # Remove PUBLIUS signature
-            text_content = re.sub(r'\s*PUBLIUS\s*$', '', text_content)
-            
-            # Remove any footnotes (assuming they start with numbers in parentheses)
-            text_content = re.sub(r'\(\d+\)[^\n]*\n', '', text_content)
-            
-            # Clean up extra whitespace
-            text_content = re.sub(r'\s+', ' ', text_content)
-            text_content = text_content.strip()
-            
-            # Create the paper entry
-            current_paper = {
-                "number": current_number,
-                "author": author,
-                "text": text_content
-            }
-    
-    # Don't forget to append the last paper (unless we hit test_limit)
-    if current_paper is not None and (not test_limit or len(papers) < test_limit):
-        papers.append(current_paper)
-    
-    return papers
+        
+        # Emit every paper whose following header has arrived
+        next_header = HEADER_PATTERN.search(buffer, header.end())
+        while next_header is not None:
+            paper = _close_paper(header, buffer[header.end():next_header.start()])
+            if paper is not None:
+                yield paper
+            buffer = buffer[next_header.start():]
+            header = HEADER_PATTERN.match(buffer)
+            next_header = HEADER_PATTERN.search(buffer, header.end())
+        buffer = buffer[header.start():]
+    
+    # The last paper runs to the end of the text
+    header = HEADER_PATTERN.search(buffer)
+    if header is not None:
+        paper = _close_paper(header, buffer[header.end():])
+        if paper is not None:
+            yield paper
+
+def _close_paper(header, text_content: str):
+    number = int(re.search(r'\d+', header.group()).group())
+    print(f"Processing paper number {number}")
+    if not text_content.strip():
+        return None
+    return build_paper(number, text_content)
+
+def parse_federalist_papers(text: str, test_limit: int = None) -> List[Dict]:
+    """Parse the text into individual Federalist Papers."""
+    papers = iter_federalist_papers([text])
+    return list(islice(papers, test_limit) if test_limit else papers)
 
 def main():
     # Set up argument parser
     parser = argparse.ArgumentParser(description='Process Federalist Papers from PDF')
     parser.add_argument('--test', type=int, help='Process only the first N papers')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes extracting pages (default: number of CPUs)')
     args = parser.parse_args()
     
     # Read and process the PDF
     pdf_path = "5008_Federalist Papers.pdf"
     print(f"Starting to process {pdf_path}")
     
-    text = extract_text_from_pdf(pdf_path)
-    
-    # Parse the text into individual papers
-    federalist_papers = parse_federalist_papers(text, args.test)
+    # Stream pages from the extractor straight into the parser
+    pages = iter_pdf_pages(pdf_path, args.workers)
+    papers = iter_federalist_papers(page + '\n' for page in pages)
+    federalist_papers = list(islice(papers, args.test) if args.test else papers)
     
     # Sort papers by number
     federalist_papers.sort(key=lambda x: x["number"])
     
     # Print statistics
     print(f"\nProcessed {len(federalist_papers)} papers")
+    manifest = Manifest()
+    changed = manifest.changed('extract', federalist_papers)
+    if changed and len(changed) < len(federalist_papers):
+        print(f"Papers changed since the last run: {changed}")
+    elif not changed:
+        print("No papers changed since the last run")
     
     # Save to JSON file
     output_path = "federalist_papers.json"
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump(federalist_papers, f, indent=2, ensure_ascii=False)
+    write_binary_corpus(federalist_papers, binary_path_for(output_path))
+    manifest.record('extract', federalist_papers, federalist_papers)
     
     print(f"Output saved to {output_path}")
 
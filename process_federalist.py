@@ -1,19 +1,40 @@
 import json
 import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from ollama import Client
 from datetime import datetime, timedelta
+from binary_corpus import binary_path_for, write_binary_corpus
+from llm_cache import DEFAULT_CACHE_PATH, LLMCache
+from checkpoint import Journal, journal_path_for
+from manifest import Manifest, inputs_hash
+from text_chunks import chunk_text
 
-def clean_text_with_ollama(text, max_retries=3, retry_delay=2):
+CLEAN_MODEL = 'phi4'
+CLEAN_PROMPT = "Clean and format the following text as a single continuous string, removing any newlines or extra spaces: "
+CHUNK_CHARS = 4000
+CHUNK_WORKERS = 4
+
+def clean_text_with_ollama(text, max_retries=3, retry_delay=2, cache=None):
+    if cache is not None:
+        cached = cache.get(CLEAN_MODEL, CLEAN_PROMPT, text)
+        if cached is not None:
+            return cached
+    
     client = Client()
-    prompt = "Clean and format the following text as a single continuous string, removing any newlines or extra spaces: " + text
+    prompt = CLEAN_PROMPT + text
     
     for attempt in range(max_retries):
         try:
-            response = client.chat(model='phi4', messages=[{
+            response = client.chat(model=CLEAN_MODEL, messages=[{
                 'role': 'user',
                 'content': prompt
             }])
-            return response.message.content.strip()
+            cleaned = response.message.content.strip()
+            # Unchanged text counts as a failed cleanup, so it is not cached
+            if cache is not None and cleaned != text:
+                cache.put(cleaned, CLEAN_MODEL, CLEAN_PROMPT, text)
+            return cleaned
         except Exception as e:
             if attempt < max_retries - 1:
                 print(f"Attempt {attempt + 1} failed: {e}")
@@ -24,30 +45,67 @@ def clean_text_with_ollama(text, max_retries=3, retry_delay=2):
                 print(f"Final attempt failed: {e}")
                 return text  # Return original text if all retries fail
 
-def process_federalist_papers():
+def clean_paper_text(text, max_chars=CHUNK_CHARS, workers=CHUNK_WORKERS, cache=None):
+    """
+    Clean a paper as sentence-aligned chunks of at most max_chars characters,
+    cleaned in parallel and stitched back together. A chunk whose cleaning
+    fails keeps its original text.
+    Returns tuple: (cleaned_text, failed_chunks, total_chunks)
+    """
+    chunks = chunk_text(text, max_chars)
+    if not chunks:
+        return text, 0, 0
+    
+    with ThreadPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        cleaned = list(pool.map(lambda chunk: clean_text_with_ollama(chunk, cache=cache), chunks))
+    
+    failed_chunks = sum(1 for original, result in zip(chunks, cleaned) if result == original)
+    return ' '.join(cleaned), failed_chunks, len(chunks)
+
+def process_federalist_papers(max_chars=CHUNK_CHARS, workers=CHUNK_WORKERS,
+                              input_path='federalist_papers.json', output_path='fp_edited.json',
+                              cache_path=DEFAULT_CACHE_PATH, use_cache=True):
     # Read the original file
-    with open('federalist_papers.json', 'r') as file:
+    with open(input_path, 'r') as file:
         papers = json.load(file)
     
-    total_papers = len(papers)
+    # Reuse the output of papers whose input hasn't changed since the last run
+    manifest = Manifest()
+    settings = (CLEAN_MODEL, CLEAN_PROMPT, max_chars)
+    reused = manifest.reusable('clean_text', papers, output_path, *settings)
+    if reused:
+        print(f"Reusing {len(reused)} unchanged papers from {output_path}")
+    
+    # Resume from the journal of an interrupted run over the same input
+    journal = Journal(journal_path_for(output_path), inputs_hash(papers, *settings))
+    completed = journal.load()
+    pending = [paper for paper in papers if paper['number'] not in completed and paper['number'] not in reused]
+    if completed:
+        print(f"Resuming: {len(completed)} papers already processed in {journal.path}")
+    
+    total_papers = len(pending)
     processed_papers = 0
     total_time = 0
     start_time = time.time()
-    failed_papers = []
+    cache = LLMCache(cache_path) if use_cache else None
+    partially_failed = {}
     
     # Process each paper
-    for paper in papers:
+    for paper in pending:
         paper_start = time.time()
         print(f"\nProcessing paper {paper['number']} ({processed_papers + 1}/{total_papers})...")
         
         original_text = paper['text']
-        processed_text = clean_text_with_ollama(original_text)
-        
-        # Check if processing actually changed the text
-        if processed_text == original_text:
-            failed_papers.append(paper['number'])
+        processed_text, failed_chunks, total_chunks = clean_paper_text(
+            original_text, max_chars, workers, cache)
+        if failed_chunks:
+            print(f"{failed_chunks} of {total_chunks} chunks kept their original text")
+            if failed_chunks < total_chunks:
+                partially_failed[paper['number']] = f"{failed_chunks}/{total_chunks}"
         
-        paper['text'] = processed_text
+        # Record the finished paper before moving on; a paper with failed
+        # chunks is cleaned again on resume
+        journal.append(dict(paper, text=processed_text), failed=failed_chunks > 0)
         
         # Calculate timing metrics
         paper_duration = time.time() - paper_start
@@ -71,20 +129,53 @@ def process_federalist_papers():
         else:
             print(f"Paper {paper['number']} processing failed or was too quick")
         
-        time.sleep(1)  # Add a small delay to avoid overwhelming the API
+        if paper_duration > 0.1:
+            time.sleep(1)  # Add a small delay to avoid overwhelming the API
     
     # Print final statistics
     total_duration = time.time() - start_time
     print(f"\nProcessing complete!")
     print(f"Total processing time: {timedelta(seconds=int(total_duration))}")
-    print(f"Average time per paper: {(total_duration/total_papers):.1f} seconds")
+    if total_papers:
+        print(f"Average time per paper: {(total_duration/total_papers):.1f} seconds")
+    
+    if cache is not None:
+        cache.print_stats()
+    
+    # Assemble the processed papers from the journal; papers whose text
+    # came back unchanged were not processed correctly
+    original_texts = {paper['number']: paper['text'] for paper in papers}
+    processed = journal.assemble(papers, reused)
+    failed_papers = [paper['number'] for paper in processed if paper['text'] == original_texts[paper['number']]]
     
     if failed_papers:
         print(f"\nWarning: The following papers may not have processed correctly: {failed_papers}")
+    if partially_failed:
+        print(f"Some chunks kept their original text (failed/total chunks): {partially_failed}")
     
     # Save the processed papers
-    with open('fp_edited.json', 'w') as file:
-        json.dump(papers, file, indent=2)
+    with open(output_path, 'w') as file:
+        json.dump(processed, file, indent=2)
+    write_binary_corpus(processed, binary_path_for(output_path))
+    # Papers with failed chunks are not recorded, so the next run retries them
+    manifest.record('clean_text', papers, processed, *settings,
+                    failed=set(failed_papers) | set(journal.failed_numbers()))
+    journal.remove()
 
 if __name__ == "__main__":
-    process_federalist_papers() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Clean the Federalist Papers text with Ollama.')
+    parser.add_argument('--chunk-chars', type=int, default=CHUNK_CHARS,
+                        help=f'Maximum characters per chunk sent to the model (default: {CHUNK_CHARS})')
+    parser.add_argument('--workers', type=int, default=CHUNK_WORKERS,
+                        help=f'Chunks of one paper cleaned in parallel (default: {CHUNK_WORKERS})')
+    parser.add_argument('--input', default='federalist_papers.json',
+                        help='Papers to clean (default: federalist_papers.json)')
+    parser.add_argument('--output', default='fp_edited.json',
+                        help='File to write (default: fp_edited.json)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                        help=f'SQLite file caching model responses (default: {DEFAULT_CACHE_PATH})')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always call the model, ignoring cached responses')
+    args = parser.parse_args()
+    process_federalist_papers(args.chunk_chars, args.workers, args.input, args.output,
+                              args.cache, not args.no_cache) 
\ No newline at end of file
@@ -1,80 +1,243 @@
-import json
+import argparse
+import html
 import os
-from datetime import datetime
+import re
+import sys
+import uuid
+import zipfile
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 
 def get_project_root():
     """Get the path to the project root directory"""
     return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-def create_compilation():
-    """Create a complete compilation of all Federalist Papers"""
-    # Read the papers
-    json_path = os.path.join(get_project_root(), 'fp_tagged.json')
-    with open(json_path, 'r', encoding='utf-8') as f:
-        papers = json.load(f)
-    
-    # Sort papers by number
-    papers.sort(key=lambda x: x['number'])
-    
-    # Create markdown version
-    md_content = "# The Federalist Papers\n\n"
-    md_content += f"*Compiled on {datetime.now().strftime('%B %d, %Y')}*\n\n"
-    md_content += "## Table of Contents\n\n"
-    
-    # Create TOC
-    for paper in papers:
-        author = paper['author'].split('\n')[0].strip()
-        md_content += f"- [Federalist No. {paper['number']}](#federalist-no-{paper['number']}) by {author}\n"
-    
-    md_content += "\n---\n\n"
-    
-    # Create text version (without markdown formatting)
-    txt_content = "THE FEDERALIST PAPERS\n\n"
-    txt_content += f"Compiled on {datetime.now().strftime('%B %d, %Y')}\n\n"
-    txt_content += "TABLE OF CONTENTS\n\n"
-    
-    for paper in papers:
-        author = paper['author'].split('\n')[0].strip()
-        txt_content += f"Federalist No. {paper['number']} by {author}\n"
-    
-    txt_content += "\n" + "="*50 + "\n\n"
-    
-    # Add each paper
-    for paper in papers:
-        # Clean up author name
-        author = paper['author'].split('\n')[0].strip()
-        
-        # Markdown version
-        md_content += f"## Federalist No. {paper['number']}\n\n"
-        md_content += f"**Author: {author}**\n\n"
+sys.path.insert(0, get_project_root())
+from corpus import get_corpus
+
+FORMATS = ('md', 'txt', 'html', 'epub')
+BUFFER_SIZE = 1 << 16
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+# (paper number, author) of every paper, in compilation order
+TableOfContents = List[Tuple[int, str]]
+
+def clean_author(author: str) -> str:
+    """First line of the author field"""
+    return author.split('\n')[0].strip()
+
+def paper_body_html(paper: dict, author: str) -> str:
+    """Author line, topics, tags and text paragraphs of a paper as HTML"""
+    parts = [f"<p><strong>Author: {html.escape(author)}</strong></p>\n"]
+    if 'topics' in paper:
+        parts.append(f"<p><strong>Topics:</strong> {html.escape(', '.join(paper['topics']))}</p>\n")
+    if 'tags' in paper:
+        parts.append(f"<p><strong>Tags:</strong> {html.escape(', '.join(paper['tags']))}</p>\n")
+    for paragraph in PARAGRAPH_BREAK.split(paper['text']):
+        if paragraph.strip():
+            parts.append(f"<p>{html.escape(paragraph.strip())}</p>\n")
+    return ''.join(parts)
+
+class CompilationWriter(ABC):
+    """
+    Streams one compilation format to a buffered temporary file: the header
+    and table of contents first, then one paper at a time. close() moves the
+    finished file into place.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.file = open(self.tmp_path, 'w', encoding='utf-8', buffering=BUFFER_SIZE)
+
+    @abstractmethod
+    def begin(self, toc: TableOfContents, compiled_on: str):
+        """Write the title and table of contents."""
+
+    @abstractmethod
+    def write_paper(self, paper: dict, author: str):
+        """Write one paper."""
+
+    def close(self):
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+class MarkdownWriter(CompilationWriter):
+    def begin(self, toc: TableOfContents, compiled_on: str):
+        self.file.write("# The Federalist Papers\n\n")
+        self.file.write(f"*Compiled on {compiled_on}*\n\n")
+        self.file.write("## Table of Contents\n\n")
+        for number, author in toc:
+            self.file.write(f"- [Federalist No. {number}](#federalist-no-{number}) by {author}\n")
+        self.file.write("\n---\n\n")
+
+    def write_paper(self, paper: dict, author: str):
+        self.file.write(f"## Federalist No. {paper['number']}\n\n")
+        self.file.write(f"**Author: {author}**\n\n")
         if 'topics' in paper:
-            md_content += f"**Topics:** {', '.join(paper['topics'])}\n\n"
+            self.file.write(f"**Topics:** {', '.join(paper['topics'])}\n\n")
         if 'tags' in paper:
-            md_content += f"**Tags:** {', '.join(paper['tags'])}\n\n"
-        md_content += paper['text'] + "\n\n---\n\n"
-        
-        # Text version
-        txt_content += f"FEDERALIST No. {paper['number']}\n"
-        txt_content += f"Author: {author}\n"
+            self.file.write(f"**Tags:** {', '.join(paper['tags'])}\n\n")
+        self.file.write(paper['text'] + "\n\n---\n\n")
+
+class TextWriter(CompilationWriter):
+    """Plain text version (without markdown formatting)"""
+
+    def begin(self, toc: TableOfContents, compiled_on: str):
+        self.file.write("THE FEDERALIST PAPERS\n\n")
+        self.file.write(f"Compiled on {compiled_on}\n\n")
+        self.file.write("TABLE OF CONTENTS\n\n")
+        for number, author in toc:
+            self.file.write(f"Federalist No. {number} by {author}\n")
+        self.file.write("\n" + "="*50 + "\n\n")
+
+    def write_paper(self, paper: dict, author: str):
+        self.file.write(f"FEDERALIST No. {paper['number']}\n")
+        self.file.write(f"Author: {author}\n")
         if 'topics' in paper:
-            txt_content += f"Topics: {', '.join(paper['topics'])}\n"
+            self.file.write(f"Topics: {', '.join(paper['topics'])}\n")
         if 'tags' in paper:
-            txt_content += f"Tags: {', '.join(paper['tags'])}\n"
-        txt_content += "="*50 + "\n\n"
-        txt_content += paper['text'] + "\n\n" + "="*50 + "\n\n"
+            self.file.write(f"Tags: {', '.join(paper['tags'])}\n")
+        self.file.write("="*50 + "\n\n")
+        self.file.write(paper['text'] + "\n\n" + "="*50 + "\n\n")
+
+class HtmlWriter(CompilationWriter):
+    """Single HTML page with a linked table of contents"""
+
+    def begin(self, toc: TableOfContents, compiled_on: str):
+        self.file.write('<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+                        '<title>The Federalist Papers</title>\n</head>\n<body>\n')
+        self.file.write(f"<h1>The Federalist Papers</h1>\n<p><em>Compiled on {compiled_on}</em></p>\n")
+        self.file.write("<h2>Table of Contents</h2>\n<ul>\n")
+        for number, author in toc:
+            self.file.write(f'<li><a href="#federalist-no-{number}">Federalist No. {number}</a> '
+                            f'by {html.escape(author)}</li>\n')
+        self.file.write("</ul>\n<hr>\n")
+
+    def write_paper(self, paper: dict, author: str):
+        self.file.write(f'<section id="federalist-no-{paper["number"]}">\n')
+        self.file.write(f"<h2>Federalist No. {paper['number']}</h2>\n")
+        self.file.write(paper_body_html(paper, author))
+        self.file.write("</section>\n<hr>\n")
+
+    def close(self):
+        self.file.write("</body>\n</html>\n")
+        super().close()
+
+class EpubWriter(CompilationWriter):
+    """EPUB 3 book with one chapter per paper, written into the zip as it arrives"""
+
+    CONTAINER = ('<?xml version="1.0" encoding="utf-8"?>\n'
+                 '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+                 '<rootfiles><rootfile full-path="OEBPS/content.opf" '
+                 'media-type="application/oebps-package+xml"/></rootfiles>\n</container>\n')
+    XHTML_HEAD = ('<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+                  '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="en">\n'
+                  '<head><meta charset="utf-8"/><title>{title}</title></head>\n<body>\n')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.zip = zipfile.ZipFile(self.tmp_path, 'w', zipfile.ZIP_DEFLATED)
+        # The mimetype entry must come first and be stored uncompressed
+        self.zip.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        self.zip.writestr('META-INF/container.xml', self.CONTAINER)
+
+    @staticmethod
+    def chapter_name(number: int) -> str:
+        return f"federalist_{number:02d}.xhtml"
+
+    def begin(self, toc: TableOfContents, compiled_on: str):
+        modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        book_id = uuid.uuid5(uuid.NAMESPACE_URL, 'federalist-papers')
+        items = ''.join(f'<item id="p{number}" href="{self.chapter_name(number)}" '
+                        f'media-type="application/xhtml+xml"/>\n' for number, _ in toc)
+        spine = ''.join(f'<itemref idref="p{number}"/>\n' for number, _ in toc)
+        self.zip.writestr('OEBPS/content.opf', (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">\n'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+            f'<dc:identifier id="book-id">urn:uuid:{book_id}</dc:identifier>\n'
+            '<dc:title>The Federalist Papers</dc:title>\n'
+            '<dc:creator>Alexander Hamilton, James Madison, John Jay</dc:creator>\n'
+            '<dc:language>en</dc:language>\n'
+            f'<meta property="dcterms:modified">{modified}</meta>\n'
+            '</metadata>\n<manifest>\n'
+            '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>\n'
+            f'{items}</manifest>\n<spine>\n<itemref idref="nav"/>\n{spine}</spine>\n</package>\n'))
+        
+        entries = ''.join(f'<li><a href="{self.chapter_name(number)}">Federalist No. {number}</a> '
+                          f'by {html.escape(author)}</li>\n' for number, author in toc)
+        self.zip.writestr('OEBPS/nav.xhtml', (
+            self.XHTML_HEAD.format(title='The Federalist Papers') +
+            f'<h1>The Federalist Papers</h1>\n<p><em>Compiled on {compiled_on}</em></p>\n'
+            f'<nav epub:type="toc" id="toc">\n<h2>Table of Contents</h2>\n<ol>\n{entries}</ol>\n</nav>\n'
+            '</body>\n</html>\n'))
+
+    def write_paper(self, paper: dict, author: str):
+        title = f"Federalist No. {paper['number']}"
+        self.zip.writestr(f"OEBPS/{self.chapter_name(paper['number'])}", (
+            self.XHTML_HEAD.format(title=title) + f"<h1>{title}</h1>\n" +
+            paper_body_html(paper, author) + "</body>\n</html>\n"))
+
+    def close(self):
+        self.zip.close()
+        os.replace(self.tmp_path, self.path)
+
+WRITERS = {
+    'md': MarkdownWriter,
+    'txt': TextWriter,
+    'html': HtmlWriter,
+    'epub': EpubWriter,
+}
+
+def create_compilation(formats: Tuple[str, ...] = ('md', 'txt'), json_path: Optional[str] = None,
+                       output_dir: Optional[str] = None) -> Dict[str, str]:
+    """
+    Create a complete compilation of all Federalist Papers in each format.
+    The table of contents comes from the paper index, then every paper is
+    read once and streamed to all writers, so memory stays flat however
+    large the corpus is. Returns the path written for each format.
+    """
+    json_path = json_path or os.path.join(get_project_root(), 'fp_tagged.json')
+    output_dir = output_dir or get_project_root()
+    corpus = get_corpus(json_path)
+    
+    # Papers sorted by number, with authors read without decoding any text
+    numbers = corpus.paper_numbers()
+    toc = [(number, clean_author(corpus.author(number))) for number in numbers]
+    compiled_on = datetime.now().strftime('%B %d, %Y')
     
-    # Save markdown version
-    md_path = os.path.join(get_project_root(), 'federalist_papers.md')
-    with open(md_path, 'w', encoding='utf-8') as f:
-        f.write(md_content)
+    paths = {fmt: os.path.join(output_dir, f"federalist_papers.{fmt}") for fmt in formats}
+    writers = [WRITERS[fmt](path) for fmt, path in paths.items()]
+    for writer in writers:
+        writer.begin(toc, compiled_on)
     
-    # Save text version
-    txt_path = os.path.join(get_project_root(), 'federalist_papers.txt')
-    with open(txt_path, 'w', encoding='utf-8') as f:
-        f.write(txt_content)
+    # Add each paper to every format in a single pass
+    for paper in corpus.iter_papers(numbers):
+        author = clean_author(paper['author'])
+        for writer in writers:
+            writer.write_paper(paper, author)
+    
+    for writer in writers:
+        writer.close()
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile all Federalist Papers into single documents.')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=['md', 'txt'],
+                        help='Output formats (default: md txt)')
+    parser.add_argument('--json', default=None,
+                        help='Papers JSON file (default: fp_tagged.json in the project root)')
+    parser.add_argument('--output-dir', default=None,
+                        help='Directory for the compilations (default: the project root)')
+    args = parser.parse_args()
     
-    print(f"Created markdown version: {md_path}")
-    print(f"Created text version: {txt_path}")
+    names = {'md': 'markdown', 'txt': 'text', 'html': 'HTML', 'epub': 'EPUB'}
+    paths = create_compilation(tuple(dict.fromkeys(args.formats)), args.json, args.output_dir)
+    for fmt, path in paths.items():
+        print(f"Created {names[fmt]} version: {path}")
 
 if __name__ == "__main__":
-    create_compilation() 
\ No newline at end of file
+    main()
@@ -0,0 +1,225 @@
+import json
+import os
+import pickle
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+INDEX_VERSION = 3
+WORD_PATTERN = re.compile(r'\w+')
+SPLIT_PATTERN = re.compile(r'\S+')
+
+# Postings for one term: parallel arrays of paper position, token offset and
+# character offset, ordered by paper and then by position within the paper.
+Postings = Tuple[array, array, array]
+EMPTY_POSTINGS: Postings = (array('I'), array('I'), array('I'))
+
+# Indexes already loaded in this process, keyed by absolute JSON path
+_loaded_indexes: Dict[str, 'SearchIndex'] = {}
+
+def index_path_for(json_file: str) -> str:
+    """Return the path of the on-disk index that belongs to a JSON file."""
+    return os.path.splitext(json_file)[0] + '.idx'
+
+def source_signature(json_file: str) -> Optional[Tuple[int, int]]:
+    """Return the (size, mtime) pair used to detect changes to a source file."""
+    try:
+        stat = os.stat(json_file)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+class SearchIndex:
+    """Positional inverted index over the words of every paper."""
+
+    def __init__(self, papers: List[Dict], postings: Dict[str, Postings],
+                 token_starts: List[array], split_offsets: List[Tuple[array, array]],
+                 signature: Optional[Tuple] = None):
+        self.papers = papers
+        self.postings = postings
+        self.token_starts = token_starts
+        # Start and end offsets of the whitespace-separated words of each
+        # paper, i.e. of what str.split() would return
+        self.split_offsets = split_offsets
+        self.signature = signature
+
+    @property
+    def doc_count(self) -> int:
+        return len(self.papers)
+
+    def token_end(self, doc_id: int, token_pos: int) -> int:
+        """Return the character offset just past a token."""
+        start = self.token_starts[doc_id][token_pos]
+        return WORD_PATTERN.match(self.papers[doc_id]['text'], start).end()
+
+    @classmethod
+    def build(cls, papers: List[Dict], signature: Optional[Tuple] = None) -> 'SearchIndex':
+        """Tokenize every paper once and collect the postings for each term."""
+        postings = {}
+        token_starts = []
+        split_offsets = []
+        for doc_id, paper in enumerate(papers):
+            split_starts, split_ends = array('I'), array('I')
+            for match in SPLIT_PATTERN.finditer(paper['text']):
+                split_starts.append(match.start())
+                split_ends.append(match.end())
+            split_offsets.append((split_starts, split_ends))
+
+            starts = array('I')
+            for token_pos, match in enumerate(WORD_PATTERN.finditer(paper['text'])):
+                term = match.group().lower()
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = (array('I'), array('I'), array('I'))
+                entry[0].append(doc_id)
+                entry[1].append(token_pos)
+                entry[2].append(match.start())
+                starts.append(match.start())
+            token_starts.append(starts)
+        return cls(papers, postings, token_starts, split_offsets, signature)
+
+    def save(self, path: str):
+        """Write the index to disk."""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                'version': INDEX_VERSION,
+                'signature': self.signature,
+                'papers': self.papers,
+                'postings': self.postings,
+                'token_starts': self.token_starts,
+                'split_offsets': self.split_offsets,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['SearchIndex']:
+        """Read an index from disk, returning None if it is missing or outdated."""
+        try:
+            with open(path, 'rb') as f:
+                data = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        if not isinstance(data, dict) or data.get('version') != INDEX_VERSION:
+            return None
+        return cls(data['papers'], data['postings'], data['token_starts'],
+                   data['split_offsets'], data['signature'])
+
+    def context_words(self, doc_id: int, start: int, end: int, count: int) -> Tuple[List[str], List[str]]:
+        """
+        Return the last count words before start and the first count words
+        after end, equal to text[:start].split()[-count:] and
+        text[end:].split()[:count] but found by bisecting the word offsets.
+        """
+        text = self.papers[doc_id]['text']
+        starts, ends = self.split_offsets[doc_id]
+        if count <= 0:
+            # Keep the slicing semantics of the plain split for these widths
+            return text[:start].split()[-count:], text[end:].split()[:count]
+
+        # Words ending at or before start, plus any word cut by start
+        first_cut = bisect_right(ends, start)
+        before = [text[starts[i]:ends[i]] for i in range(max(0, first_cut - count), first_cut)]
+        if first_cut < len(starts) and starts[first_cut] < start:
+            before.append(text[starts[first_cut]:start])
+            before = before[-count:]
+
+        # Words starting at or after end, preceded by any word cut by end
+        first_after = bisect_left(starts, end)
+        after = []
+        if first_after > 0 and ends[first_after - 1] > end:
+            after.append(text[end:ends[first_after - 1]])
+        after.extend(text[starts[i]:ends[i]]
+                     for i in range(first_after, min(len(starts), first_after + count - len(after))))
+        return before, after
+
+    def opening_words(self, doc_id: int, count: int) -> List[str]:
+        """Return the first count words of a paper."""
+        text = self.papers[doc_id]['text']
+        starts, ends = self.split_offsets[doc_id]
+        return [text[starts[i]:ends[i]] for i in range(min(max(count, 0), len(starts)))]
+
+    def lookup(self, term: str) -> Postings:
+        """Return the postings of a single word (case-insensitive)."""
+        return self.postings.get(term.lower(), EMPTY_POSTINGS)
+
+    def find(self, search_term: str) -> List[Tuple[int, int, int]]:
+        """
+        Find every occurrence of search_term as a whole word or phrase.
+        Returns list of tuples: (paper_position, start_char, end_char), matching
+        exactly what a case-insensitive \\b<term>\\b regex scan would return.
+        """
+        pattern = re.compile(r'\b' + re.escape(search_term) + r'\b', re.IGNORECASE)
+        terms = WORD_PATTERN.findall(search_term.lower())
+
+        # Terms that do not start and end with a word character cannot be
+        # anchored on a token, so fall back to scanning the text.
+        if (not terms or not WORD_PATTERN.match(search_term[0])
+                or not WORD_PATTERN.match(search_term[-1])):
+            return [(doc_id, match.start(), match.end())
+                    for doc_id, paper in enumerate(self.papers)
+                    for match in pattern.finditer(paper['text'])]
+
+        # Anchor on the rarest word of the phrase and verify each candidate
+        anchor = min(range(len(terms)), key=lambda i: len(self.postings.get(terms[i], EMPTY_POSTINGS)[0]))
+        docs, positions, _ = self.lookup(terms[anchor])
+
+        results = []
+        last_end = {}
+        for doc_id, token_pos in zip(docs, positions):
+            first_pos = token_pos - anchor
+            if first_pos < 0:
+                continue
+            start = self.token_starts[doc_id][first_pos]
+            if start < last_end.get(doc_id, 0):
+                continue
+            match = pattern.match(self.papers[doc_id]['text'], start)
+            if match:
+                results.append((doc_id, match.start(), match.end()))
+                last_end[doc_id] = match.end()
+        return results
+
+def load_papers_json(json_file: str) -> List[Dict]:
+    """Load the list of papers from a JSON file."""
+    with open(json_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def merge_tags(papers: List[Dict], tags_file: str):
+    """Copy the tags field from tags_file onto papers that do not have one."""
+    if all('tags' in paper for paper in papers) or not os.path.exists(tags_file):
+        return
+    tags_by_number = {paper['number']: paper.get('tags', []) for paper in load_papers_json(tags_file)}
+    for paper in papers:
+        if 'tags' not in paper and paper['number'] in tags_by_number:
+            paper['tags'] = tags_by_number[paper['number']]
+
+def get_index(json_file: str, tags_file: str = 'fp_tagged.json') -> SearchIndex:
+    """
+    Return the index for json_file, loading it at most once per process and
+    rebuilding the on-disk copy whenever the source JSON has changed.
+    Papers without a tags field take their tags from tags_file.
+    """
+    key = os.path.abspath(json_file)
+    json_signature = source_signature(json_file)
+    if json_signature is None:
+        raise FileNotFoundError(json_file)
+    signature = (json_signature, source_signature(tags_file))
+
+    index = _loaded_indexes.get(key)
+    if index is not None and index.signature == signature:
+        return index
+
+    path = index_path_for(json_file)
+    index = SearchIndex.load(path)
+    if index is None or index.signature != signature:
+        papers = load_papers_json(json_file)
+        merge_tags(papers, tags_file)
+        index = SearchIndex.build(papers, signature)
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"Warning: could not save search index to {path}: {e}")
+
+    _loaded_indexes[key] = index
+    return index
@@ -1,48 +1,68 @@
 import json
 import argparse
 import re
-from typing import Dict, List, Tuple
+from typing import List, Optional, Tuple
+from search_index import SearchIndex, get_index
+from search_query import QueryError, run_query
 
-def load_papers(json_file: str = 'fp_edited.json') -> List[Dict]:
-    """Load papers from JSON file."""
+def load_index(json_file: str = 'fp_edited.json') -> Optional[SearchIndex]:
+    """Load the search index for a JSON file, building it if needed."""
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return get_index(json_file)
     except FileNotFoundError:
         print(f"Error: {json_file} not found.")
-        return []
+        return None
+    except json.JSONDecodeError:
+        print(f"Error: Invalid JSON file {json_file}")
+        return None
 
-def search_papers(papers: List[Dict], search_term: str, context_words: int = 10) -> List[Tuple[int, str, str]]:
+def search_papers(index: SearchIndex, search_term: str, context_words: int = 10) -> List[Tuple[int, str, str]]:
     """
     Search for term in papers and return matches with context.
     Returns list of tuples: (paper_number, author, context)
     """
     results = []
-    search_pattern = re.compile(r'\b' + re.escape(search_term) + r'\b', re.IGNORECASE)
     
-    for paper in papers:
-        matches = search_pattern.finditer(paper['text'])
-        for match in matches:
-            # Get the context around the match
-            start_pos = max(0, match.start())
-            end_pos = min(len(paper['text']), match.end())
-            
-            # Get words before and after
-            before_text = paper['text'][:start_pos].split()[-context_words:]
-            after_text = paper['text'][end_pos:].split()[:context_words]
-            
-            # Create context string
-            context = ' '.join(before_text + 
-                             [f"**{paper['text'][start_pos:end_pos]}**"] + 
-                             after_text)
-            
+    for doc_id, start_pos, end_pos in index.find(search_term):
+        paper = index.papers[doc_id]
+        context = get_context(index, doc_id, start_pos, end_pos, context_words)
+        results.append((paper['number'], paper['author'], context))
+    
+    return results
+
+def get_context(index: SearchIndex, doc_id: int, start_pos: int, end_pos: int, context_words: int) -> str:
+    """Highlight a match with context_words words on either side."""
+    # Get words before and after from the precomputed word offsets
+    before_text, after_text = index.context_words(doc_id, start_pos, end_pos, context_words)
+    
+    # Create context string
+    return ' '.join(before_text + 
+                    [f"**{index.papers[doc_id]['text'][start_pos:end_pos]}**"] + 
+                    after_text)
+
+def query_papers(index: SearchIndex, query: str, context_words: int = 10) -> List[Tuple[int, str, str]]:
+    """
+    Evaluate a boolean/phrase/proximity query and return matches with context.
+    Papers matched only by filters are listed with their opening words.
+    Returns list of tuples: (paper_number, author, context)
+    """
+    results = []
+    
+    for doc_id, spans in run_query(index, query):
+        paper = index.papers[doc_id]
+        if not spans:
+            opening = index.opening_words(doc_id, context_words * 2)
+            results.append((paper['number'], paper['author'], ' '.join(opening) + '...'))
+        for start_pos, end_pos in spans:
+            context = get_context(index, doc_id, start_pos, end_pos, context_words)
             results.append((paper['number'], paper['author'], context))
     
     return results
 
 def save_results(results: List[Tuple[int, str, str]], search_term: str):
     """Save search results to a file."""
-    output_file = f"search_results_{search_term.replace(' ', '_')}.txt"
+    safe_term = re.sub(r'[^\w.-]+', '_', search_term)
+    output_file = f"search_results_{safe_term}.txt"
     
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write(f"Search Results for: '{search_term}'\n")
@@ -55,23 +75,68 @@ def save_results(results: List[Tuple[int, str, str]], search_term: str):
     
     return output_file
 
+def print_similar(text: str, json_file: str, top_k: int = 5, embed_model: Optional[str] = None,
+                  host: Optional[str] = None):
+    """Print the passages most similar to text."""
+    try:
+        # Imported here so a plain term search doesn't load numpy
+        from similarity import find_similar
+        results = find_similar(text, json_file, top_k, embed_model, host)
+    except FileNotFoundError:
+        print(f"Error: {json_file} not found.")
+        return
+    except Exception as e:
+        print(f"Error searching for similar passages: {str(e)}")
+        return
+    
+    print(f"\nFound {len(results)} similar passages\n")
+    for result in results:
+        tags = ', '.join(result['tags']) if result['tags'] else 'none'
+        print(f"Federalist No. {result['number']} (by {result['author']}) - similarity {result['score']:.3f}")
+        print(f"Tags: {tags}")
+        print("-" * 40)
+        print(f"{result['passage']}\n")
+
 def main():
     parser = argparse.ArgumentParser(description='Search Federalist Papers for specific terms.')
-    parser.add_argument('term', help='Term to search for')
+    parser.add_argument('term', help='Term to search for, or a query when --query is given')
     parser.add_argument('--context', type=int, default=10,
                        help='Number of context words before and after match (default: 10)')
-    parser.add_argument('--json', default='fp_edited.json',
-                       help='JSON file containing papers (default: fp_edited.json)')
+    parser.add_argument('--json', default=None,
+                       help='JSON file containing papers (default: fp_edited.json, fp_tagged.json with --similar)')
+    parser.add_argument('--query', action='store_true',
+                       help='Treat the term as a query: AND/OR/NOT, "phrases", NEAR/n, '
+                            'author:, tag: and paper: filters')
+    parser.add_argument('--similar', action='store_true',
+                       help='Treat the term as a passage and find the most similar passages')
+    parser.add_argument('--top', type=int, default=5,
+                       help='Number of similar passages to show with --similar (default: 5)')
+    parser.add_argument('--embed-model', default=None,
+                       help='Local Ollama embedding model for --similar instead of TF-IDF')
+    parser.add_argument('--host', default=None,
+                       help='Ollama server URL for --embed-model (default: the ollama client default)')
     
     args = parser.parse_args()
     
-    # Load papers
-    papers = load_papers(args.json)
-    if not papers:
+    if args.similar:
+        print_similar(args.term, args.json or 'fp_tagged.json', args.top, args.embed_model, args.host)
+        return
+    args.json = args.json or 'fp_edited.json'
+    
+    # Load the search index
+    index = load_index(args.json)
+    if index is None or not index.papers:
         return
     
     # Search for term
-    results = search_papers(papers, args.term, args.context)
+    if args.query:
+        try:
+            results = query_papers(index, args.term, args.context)
+        except QueryError as e:
+            print(f"Error: {e}")
+            return
+    else:
+        results = search_papers(index, args.term, args.context)
     
     # Print results to console
     print(f"\nFound {len(results)} matches for '{args.term}'\n")
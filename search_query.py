@@ -0,0 +1,258 @@
+"""
+Query language for search_papers.py, evaluated against the search index.
+
+    commerce AND NOT taxation
+    "standing army" OR militia
+    safety NEAR/5 danger
+    (union OR confederacy) author:Madison tag:"Federal Power" paper:10-20
+
+Adjacent clauses without an operator are combined with AND. Every clause is
+answered from posting lists, so the paper text is never rescanned.
+"""
+import re
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Set, Tuple
+
+from search_index import WORD_PATTERN, SearchIndex
+
+# Matches, per paper position: list of (first_token, last_token + 1) spans.
+# Filters match whole papers and contribute no spans.
+Matches = Dict[int, List[Tuple[int, int]]]
+
+TOKEN_PATTERN = re.compile(r'''
+    \s*(?:
+        (?P<lparen>\()
+      | (?P<rparen>\))
+      | (?P<near>NEAR/(?P<distance>\d+))(?=[\s()"]|$)
+      | (?P<field>author|tag|paper):(?:"(?P<quoted_value>[^"]*)"|(?P<value>[^\s()]+))
+      | "(?P<phrase>[^"]*)"
+      | (?P<word>[^\s()"]+)
+    )''', re.VERBOSE | re.IGNORECASE)
+
+OPERATORS = {'AND', 'OR', 'NOT'}
+
+class QueryError(ValueError):
+    """Raised when a query cannot be parsed."""
+
+def tokenize_query(query: str) -> List[Tuple[str, object]]:
+    """Split a query string into (kind, value) tokens."""
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = TOKEN_PATTERN.match(query, pos)
+        if not match or match.end() == pos:
+            raise QueryError(f"Cannot parse query near: {query[pos:]!r}")
+        pos = match.end()
+        if match.group('lparen'):
+            tokens.append(('(', None))
+        elif match.group('rparen'):
+            tokens.append((')', None))
+        elif match.group('near'):
+            tokens.append(('NEAR', int(match.group('distance'))))
+        elif match.group('field'):
+            value = match.group('quoted_value')
+            if value is None:
+                value = match.group('value')
+            tokens.append(('FIELD', (match.group('field').lower(), value)))
+        elif match.group('phrase') is not None:
+            tokens.append(('TERMS', WORD_PATTERN.findall(match.group('phrase').lower())))
+        elif match.group('word') in OPERATORS:
+            tokens.append((match.group('word'), None))
+        else:
+            tokens.append(('TERMS', WORD_PATTERN.findall(match.group('word').lower())))
+    return tokens
+
+class QueryParser:
+    """
+    Recursive descent parser producing a nested tuple tree:
+    ('terms', [...]), ('field', name, value), ('not', node),
+    ('and', left, right), ('or', left, right), ('near', distance, left, right)
+    """
+
+    def __init__(self, query: str):
+        self.tokens = tokenize_query(query)
+        self.pos = 0
+
+    def peek(self) -> str:
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def take(self) -> Tuple[str, object]:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QueryError("Empty query")
+        node = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise QueryError(f"Unexpected {self.peek()!r} in query")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == 'OR':
+            self.take()
+            node = ('or', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() in ('AND', 'NOT', 'TERMS', 'FIELD', '('):
+            if self.peek() == 'AND':
+                self.take()
+            node = ('and', node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek() == 'NOT':
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_near()
+
+    def parse_near(self):
+        node = self.parse_primary()
+        while self.peek() == 'NEAR':
+            distance = self.take()[1]
+            node = ('near', distance, node, self.parse_primary())
+        return node
+
+    def parse_primary(self):
+        kind = self.peek()
+        if kind == '(':
+            self.take()
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise QueryError("Missing closing parenthesis")
+            self.take()
+            return node
+        if kind == 'TERMS':
+            terms = self.take()[1]
+            if not terms:
+                raise QueryError("Empty phrase in query")
+            return ('terms', terms)
+        if kind == 'FIELD':
+            name, value = self.take()[1]
+            return ('field', name, value)
+        raise QueryError(f"Expected a term, phrase or filter but found {kind!r}")
+
+def parse_query(query: str):
+    """Parse a query string into a query tree."""
+    return QueryParser(query).parse()
+
+def _term_positions(index: SearchIndex, term: str) -> Dict[int, List[int]]:
+    """Group the token positions of one word by paper."""
+    docs, positions, _ = index.lookup(term)
+    grouped = {}
+    for doc_id, token_pos in zip(docs, positions):
+        grouped.setdefault(doc_id, []).append(token_pos)
+    return grouped
+
+def _match_terms(index: SearchIndex, terms: List[str]) -> Matches:
+    """Match a single word or a phrase of consecutive words."""
+    first = _term_positions(index, terms[0])
+    if len(terms) == 1:
+        return {doc_id: [(pos, pos + 1) for pos in positions] for doc_id, positions in first.items()}
+
+    # Intersect the remaining words' position sets, shifted by their offset
+    followers = [_term_positions(index, term) for term in terms[1:]]
+    matches = {}
+    for doc_id, starts in first.items():
+        sets = []
+        for grouped in followers:
+            if doc_id not in grouped:
+                break
+            sets.append(set(grouped[doc_id]))
+        else:
+            spans = [(pos, pos + len(terms)) for pos in starts
+                     if all(pos + offset in positions for offset, positions in enumerate(sets, 1))]
+            if spans:
+                matches[doc_id] = spans
+    return matches
+
+def _parse_numbers(value: str) -> Set[int]:
+    """Parse '10', '10-14' or '10,12,15' into a set of paper numbers."""
+    numbers = set()
+    for part in value.split(','):
+        try:
+            if '-' in part:
+                low, high = part.split('-', 1)
+                numbers.update(range(int(low), int(high) + 1))
+            elif part:
+                numbers.add(int(part))
+        except ValueError:
+            raise QueryError(f"Invalid paper number filter: {value!r}")
+    return numbers
+
+def _match_field(index: SearchIndex, name: str, value: str) -> Matches:
+    """Match papers by author, tag or number."""
+    wanted = value.lower()
+    if name == 'paper':
+        numbers = _parse_numbers(value)
+        return {doc_id: [] for doc_id, paper in enumerate(index.papers) if paper['number'] in numbers}
+    if name == 'author':
+        return {doc_id: [] for doc_id, paper in enumerate(index.papers)
+                if wanted in paper.get('author', '').lower()}
+    return {doc_id: [] for doc_id, paper in enumerate(index.papers)
+            if wanted in (tag.lower() for tag in paper.get('tags', []))}
+
+def _match_near(left: Matches, right: Matches, distance: int) -> Matches:
+    """Keep spans of left and right that lie within distance words of each other."""
+    matches = {}
+    for doc_id in left.keys() & right.keys():
+        right_spans = sorted(right[doc_id])
+        right_starts = [span[0] for span in right_spans]
+        longest = max(end - start for start, end in right_spans) if right_spans else 0
+        kept = set()
+        for span in left[doc_id]:
+            # Only right spans starting in this window can be close enough
+            low = bisect_left(right_starts, span[0] - distance - longest)
+            high = bisect_right(right_starts, span[1] + distance)
+            for other in right_spans[low:high]:
+                gap = max(other[0] - span[1], span[0] - other[1])
+                if gap <= distance:
+                    kept.add(span)
+                    kept.add(other)
+        if kept:
+            matches[doc_id] = sorted(kept)
+    return matches
+
+def evaluate(index: SearchIndex, node) -> Matches:
+    """Evaluate a parsed query tree by merging posting lists."""
+    kind = node[0]
+    if kind == 'terms':
+        return _match_terms(index, node[1])
+    if kind == 'field':
+        return _match_field(index, node[1], node[2])
+    if kind == 'not':
+        excluded = evaluate(index, node[1])
+        return {doc_id: [] for doc_id in range(index.doc_count) if doc_id not in excluded}
+    if kind == 'near':
+        return _match_near(evaluate(index, node[2]), evaluate(index, node[3]), node[1])
+
+    left = evaluate(index, node[1])
+    if kind == 'and':
+        if not left:
+            return {}
+        right = evaluate(index, node[2])
+        return {doc_id: sorted(set(left[doc_id] + right[doc_id])) for doc_id in left.keys() & right.keys()}
+
+    right = evaluate(index, node[2])
+    merged = {}
+    for doc_id in left.keys() | right.keys():
+        merged[doc_id] = sorted(set(left.get(doc_id, []) + right.get(doc_id, [])))
+    return merged
+
+def run_query(index: SearchIndex, query: str) -> List[Tuple[int, List[Tuple[int, int]]]]:
+    """
+    Evaluate a query string.
+    Returns list of tuples in paper order: (paper_position, [(start_char, end_char), ...])
+    """
+    matches = evaluate(index, parse_query(query))
+    results = []
+    for doc_id in sorted(matches):
+        spans = [(index.token_starts[doc_id][first], index.token_end(doc_id, last - 1))
+                 for first, last in matches[doc_id]]
+        results.append((doc_id, spans))
+    return results
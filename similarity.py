@@ -0,0 +1,236 @@
+"""
+Passage similarity search over the corpus without calling a language model.
+
+Every paper is cut into sentence-aligned passages (text_chunks.chunk_spans)
+and each passage is vectorized, by default as a TF-IDF vector of its
+content words. A query is scored against every passage by its exact TF-IDF
+cosine, one vectorized product over the sparse (CSR) passage matrix. With
+an embedding model the passages are embedded once through the local Ollama
+server and only the query is embedded per search.
+
+The index is saved as <stem>.sim.npz beside the corpus JSON and rebuilt
+whenever the JSON changes.
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from corpus import get_corpus
+from doc_term_matrix import tokenize
+from search_index import source_signature
+from text_chunks import chunk_spans
+from word_analysis import STOP_WORDS
+
+SIMILARITY_VERSION = 2
+PASSAGE_CHARS = 800
+
+# Indexes already loaded in this process, keyed by (JSON path, embedding model)
+_loaded_indexes: Dict[Tuple[str, Optional[str]], 'SimilarityIndex'] = {}
+
+def similarity_path_for(json_file: str, embed_model: Optional[str] = None) -> str:
+    """Return the path of the similarity index of a JSON file."""
+    stem = os.path.splitext(json_file)[0]
+    if embed_model:
+        stem += '.' + ''.join(c if c.isalnum() else '_' for c in embed_model)
+    return stem + '.sim.npz'
+
+def content_tokens(text: str) -> List[str]:
+    return [word for word in tokenize(text) if word not in STOP_WORDS and len(word) >= 3]
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+class SimilarityIndex:
+    """Passage spans of every paper and their vectors."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], embed_model: Optional[str] = None):
+        self.numbers = arrays['numbers']
+        self.starts = arrays['starts']
+        self.ends = arrays['ends']
+        self.vectors = arrays['vectors']
+        self.signature = arrays['signature'].tolist()
+        self.embed_model = embed_model
+        # TF-IDF only: vocabulary, weights and the exact sparse vectors (CSR)
+        self.vocab = arrays.get('vocab')
+        self.idf = arrays.get('idf')
+        self.indptr = arrays.get('indptr')
+        self.indices = arrays.get('indices')
+        self.weights = arrays.get('weights')
+        self._rows = None
+
+    @staticmethod
+    def passages(papers: List[dict], passage_chars: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        numbers, starts, ends = [], [], []
+        for paper in papers:
+            for start, end in chunk_spans(paper['text'], passage_chars):
+                numbers.append(paper['number'])
+                starts.append(start)
+                ends.append(end)
+        return (np.array(numbers, dtype=np.int32), np.array(starts, dtype=np.int64),
+                np.array(ends, dtype=np.int64))
+
+    @classmethod
+    def build_tfidf(cls, papers: List[dict], signature, passage_chars: int = PASSAGE_CHARS) -> 'SimilarityIndex':
+        """Vectorize every passage as l2-normalized sublinear TF-IDF."""
+        numbers, starts, ends = cls.passages(papers, passage_chars)
+        texts = {paper['number']: paper['text'] for paper in papers}
+        tokens, lengths = [], []
+        for number, start, end in zip(numbers, starts, ends):
+            passage_tokens = content_tokens(texts[int(number)][start:end])
+            tokens.extend(passage_tokens)
+            lengths.append(len(passage_tokens))
+
+        vocab, ids = np.unique(np.array(tokens, dtype=str), return_inverse=True)
+        rows = np.repeat(np.arange(len(numbers), dtype=np.int64), lengths)
+        # An empty vocabulary (no content words at all) gives an index with no entries
+        width = max(len(vocab), 1)
+        keys, counts = np.unique(rows * width + ids.reshape(-1), return_counts=True)
+        key_rows, indices = keys // width, keys % width
+        indptr = np.zeros(len(numbers) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(key_rows, minlength=len(numbers)), out=indptr[1:])
+
+        df = np.bincount(indices, minlength=len(vocab))
+        idf = (np.log((1 + len(numbers)) / (1 + df)) + 1).astype(np.float32)
+        weights = ((1 + np.log(counts)) * idf[indices]).astype(np.float32)
+        norms = np.sqrt(np.bincount(key_rows, weights=weights ** 2, minlength=len(numbers)))
+        weights /= np.where(norms > 0, norms, 1)[key_rows].astype(np.float32)
+
+        return cls({
+            'numbers': numbers, 'starts': starts, 'ends': ends,
+            'vectors': np.zeros((len(numbers), 0), dtype=np.float32),
+            'signature': np.array(signature, dtype=np.int64),
+            'vocab': vocab, 'idf': idf, 'indptr': indptr,
+            'indices': indices.astype(np.int32), 'weights': weights,
+        })
+
+    @classmethod
+    def build_embeddings(cls, papers: List[dict], signature, embed_model: str, host: Optional[str] = None,
+                         passage_chars: int = PASSAGE_CHARS, batch_size: int = 32) -> 'SimilarityIndex':
+        """Embed every passage with a local Ollama embedding model."""
+        numbers, starts, ends = cls.passages(papers, passage_chars)
+        texts = {paper['number']: paper['text'] for paper in papers}
+        passages = [texts[int(number)][start:end] for number, start, end in zip(numbers, starts, ends)]
+        print(f"Embedding {len(passages)} passages with {embed_model}...")
+        vectors = []
+        for i in range(0, len(passages), batch_size):
+            vectors.extend(embed(passages[i:i + batch_size], embed_model, host))
+        return cls({
+            'numbers': numbers, 'starts': starts, 'ends': ends,
+            'vectors': _normalize(np.array(vectors, dtype=np.float32)),
+            'signature': np.array(signature, dtype=np.int64),
+        }, embed_model)
+
+    def save(self, path: str):
+        arrays = {'version': np.array(SIMILARITY_VERSION), 'numbers': self.numbers, 'starts': self.starts,
+                  'ends': self.ends, 'vectors': self.vectors, 'signature': np.array(self.signature, dtype=np.int64)}
+        if self.vocab is not None:
+            arrays.update(vocab=self.vocab, idf=self.idf, indptr=self.indptr,
+                          indices=self.indices, weights=self.weights)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, embed_model: Optional[str] = None) -> Optional['SimilarityIndex']:
+        """Read an index from disk, returning None if it is missing or outdated."""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data['version']) != SIMILARITY_VERSION:
+                    return None
+                return cls({name: data[name] for name in data.files}, embed_model)
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _query_tfidf(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Sparse (word ids, weights) of the query in the passage vector space."""
+        tokens = np.array(content_tokens(text), dtype=str)
+        if not len(tokens) or not len(self.vocab):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        positions = np.minimum(np.searchsorted(self.vocab, tokens), len(self.vocab) - 1)
+        ids, counts = np.unique(positions[self.vocab[positions] == tokens], return_counts=True)
+        weights = (1 + np.log(counts)) * self.idf[ids]
+        norm = np.linalg.norm(weights)
+        return ids, weights / norm if norm > 0 else weights
+
+    def _exact_scores(self, ids: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Exact TF-IDF cosine of the query with every passage."""
+        if self._rows is None:
+            # Passage row of every stored entry
+            self._rows = np.repeat(np.arange(len(self.numbers)), np.diff(self.indptr))
+        dense = np.zeros(len(self.vocab), dtype=np.float32)
+        dense[ids] = weights
+        return np.bincount(self._rows, weights=self.weights * dense[self.indices], minlength=len(self.numbers))
+
+    def query(self, text: str, top_k: int = 5, host: Optional[str] = None) -> List[Tuple[int, int, int, float]]:
+        """Return the top_k passages as (paper number, start, end, score), best first."""
+        if not len(self.numbers) or top_k <= 0:
+            return []
+        if self.embed_model:
+            vector = _normalize(np.array(embed([text], self.embed_model, host)[0], dtype=np.float32))
+            scores = self.vectors @ vector
+        else:
+            ids, weights = self._query_tfidf(text)
+            if not len(ids):
+                return []
+            scores = self._exact_scores(ids, weights)
+        rows = np.argpartition(-scores, min(top_k, len(scores)) - 1)[:top_k]
+        rows = rows[np.argsort(-scores[rows])]
+        # A TF-IDF score of 0 means no word in common
+        return [(int(self.numbers[r]), int(self.starts[r]), int(self.ends[r]), float(scores[r]))
+                for r in rows if self.embed_model or scores[r] > 0]
+
+def embed(texts: List[str], model: str, host: Optional[str] = None) -> List[List[float]]:
+    """Embed texts with a local Ollama embedding model."""
+    import ollama
+    response = ollama.Client(host=host).embed(model=model, input=texts)
+    return response['embeddings']
+
+def get_similarity_index(json_file: str = 'fp_tagged.json', embed_model: Optional[str] = None,
+                         host: Optional[str] = None) -> SimilarityIndex:
+    """
+    Return the similarity index of json_file, loading it at most once per
+    process and rebuilding the on-disk copy whenever the JSON has changed.
+    """
+    key = (os.path.abspath(json_file), embed_model)
+    signature = source_signature(json_file)
+    if signature is None:
+        raise FileNotFoundError(json_file)
+    signature = list(signature)
+
+    index = _loaded_indexes.get(key)
+    if index is not None and index.signature == signature:
+        return index
+
+    path = similarity_path_for(json_file, embed_model)
+    index = SimilarityIndex.load(path, embed_model)
+    if index is None or index.signature != signature:
+        papers = get_corpus(json_file).sorted_papers()
+        if embed_model:
+            index = SimilarityIndex.build_embeddings(papers, signature, embed_model, host)
+        else:
+            index = SimilarityIndex.build_tfidf(papers, signature)
+        try:
+            index.save(path)
+        except OSError as e:
+            print(f"Warning: could not save similarity index to {path}: {e}")
+
+    _loaded_indexes[key] = index
+    return index
+
+def find_similar(text: str, json_file: str = 'fp_tagged.json', top_k: int = 5,
+                 embed_model: Optional[str] = None, host: Optional[str] = None) -> List[dict]:
+    """Return the passages most similar to text with their paper number, author, tags and score."""
+    index = get_similarity_index(json_file, embed_model, host)
+    corpus = get_corpus(json_file)
+    results = []
+    for number, start, end, score in index.query(text, top_k, host):
+        paper = corpus.get_paper(number)
+        results.append({
+            'number': number,
+            'author': paper.get('author', 'Unknown'),
+            'tags': paper.get('tags', []),
+            'score': score,
+            'passage': paper['text'][start:end],
+        })
+    return results
@@ -0,0 +1,167 @@
+"""
+Per-paper corpus statistics computed with NumPy.
+
+The corpus is tokenized once into flat arrays (token ids plus the index of
+the paper each token belongs to), and every metric is a bincount or other
+vectorized reduction over those arrays. Results are written both as
+statistics.csv and as a columnar statistics.npz that readers load without
+parsing CSV.
+"""
+import csv
+import os
+import re
+from typing import Dict, List
+import numpy as np
+
+CSV_PATH = 'statistics.csv'
+COLUMNS_PATH = 'statistics.npz'
+
+# Words and runs of sentence-ending punctuation
+TOKEN_PATTERN = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*|[.!?]+")
+
+# Every code point str.split() treats as whitespace
+WHITESPACE = np.array([
+    0x09, 0x0a, 0x0b, 0x0c, 0x0d, 0x1c, 0x1d, 0x1e, 0x1f, 0x20, 0x85, 0xa0, 0x1680,
+    0x2000, 0x2001, 0x2002, 0x2003, 0x2004, 0x2005, 0x2006, 0x2007, 0x2008, 0x2009,
+    0x200a, 0x2028, 0x2029, 0x202f, 0x205f, 0x3000
+], dtype=np.uint32)
+
+# Function words whose rates separate the three authors (Mosteller & Wallace)
+FUNCTION_WORDS = ('upon', 'whilst', 'while', 'by', 'to', 'on', 'there', 'also', 'an', 'although', 'enough')
+
+class TokenizedCorpus:
+    """
+    The corpus as flat NumPy arrays: ids of all tokens in corpus order, the
+    paper index of each token, and the vocabulary the ids point into.
+    """
+
+    def __init__(self, texts: List[str]):
+        tokens = []
+        lengths = []
+        for text in texts:
+            paper_tokens = TOKEN_PATTERN.findall(text.lower())
+            tokens.extend(paper_tokens)
+            lengths.append(len(paper_tokens))
+
+        self.paper_count = len(texts)
+        self.vocab, self.ids = np.unique(np.array(tokens, dtype=str), return_inverse=True)
+        self.ids = self.ids.reshape(-1).astype(np.int32)
+        self.paper = np.repeat(np.arange(self.paper_count, dtype=np.int32), lengths)
+        self.is_terminator = np.array([token[0] in '.!?' for token in self.vocab], dtype=bool)
+
+    def counts(self, mask: np.ndarray) -> np.ndarray:
+        """Number of tokens per paper for which mask (over all tokens) is set."""
+        return np.bincount(self.paper[mask], minlength=self.paper_count)
+
+    def term_ids(self, words) -> np.ndarray:
+        """Vocabulary id of each word, or -1 for words that never occur."""
+        positions = np.searchsorted(self.vocab, words)
+        positions = np.minimum(positions, len(self.vocab) - 1)
+        found = self.vocab[positions] == np.asarray(words)
+        return np.where(found, positions, -1)
+
+def whitespace_word_counts(texts: List[str]) -> np.ndarray:
+    """Per-text count of whitespace-separated words, identical to len(text.split())."""
+    joined = '\n'.join(texts)
+    codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32)
+    space = np.isin(codes, WHITESPACE)
+    # A word starts at a non-space character that follows a space or the start
+    starts = np.flatnonzero(~space & np.concatenate(([True], space[:-1])))
+    boundaries = np.cumsum([len(text) + 1 for text in texts])
+    return np.bincount(np.searchsorted(boundaries, starts, side='right'), minlength=len(texts))
+
+def compute_statistics(papers: List[dict]) -> Dict[str, np.ndarray]:
+    """Return the per-paper metrics as columns keyed by their CSV header."""
+    texts = [paper['text'] for paper in papers]
+    corpus = TokenizedCorpus(texts)
+    terminator = corpus.is_terminator[corpus.ids]
+
+    word_tokens = corpus.counts(~terminator)
+    sentences = corpus.counts(terminator)
+    # The last sentence of a paper may end without punctuation
+    if len(corpus.ids):
+        last = np.cumsum(np.bincount(corpus.paper, minlength=corpus.paper_count)) - 1
+        has_tokens = word_tokens + sentences > 0
+        unterminated = has_tokens & ~terminator[np.maximum(last, 0)]
+        sentences = sentences + unterminated
+
+    # Distinct (paper, word) pairs give the types; pairs seen once are hapaxes
+    words = ~terminator
+    pair_keys = corpus.paper[words].astype(np.int64) * len(corpus.vocab) + corpus.ids[words]
+    pairs, pair_counts = np.unique(pair_keys, return_counts=True)
+    pair_paper = pairs // max(len(corpus.vocab), 1)
+    types = np.bincount(pair_paper, minlength=corpus.paper_count)
+    hapaxes = np.bincount(pair_paper[pair_counts == 1], minlength=corpus.paper_count)
+
+    mean_sentence = word_tokens / np.maximum(sentences, 1)
+    ttr = types / np.maximum(word_tokens, 1)
+
+    columns = {
+        'Paper Number': np.array([paper['number'] for paper in papers], dtype=np.int64),
+        'Author': np.array([paper['author'].split('\n')[0].strip() for paper in papers], dtype=str),
+        'Word Count': whitespace_word_counts(texts).astype(np.int64),
+        'Character Count': np.array([len(text) for text in texts], dtype=np.int64),
+        'Sentence Count': sentences.astype(np.int64),
+        'Mean Sentence Length': np.round(mean_sentence, 2),
+        'Type Count': types.astype(np.int64),
+        'Type-Token Ratio': np.round(ttr, 4),
+        'Hapax Count': hapaxes.astype(np.int64),
+    }
+
+    # Occurrences of each function word per 1000 word tokens
+    fw_ids = corpus.term_ids(list(FUNCTION_WORDS))
+    present = fw_ids >= 0
+    slot = np.full(len(corpus.vocab), -1, dtype=np.int64)
+    slot[fw_ids[present]] = np.arange(len(FUNCTION_WORDS))[present]
+    token_slot = slot[corpus.ids]
+    hit = token_slot >= 0
+    fw_counts = np.bincount(corpus.paper[hit].astype(np.int64) * len(FUNCTION_WORDS) + token_slot[hit],
+                            minlength=corpus.paper_count * len(FUNCTION_WORDS))
+    fw_counts = fw_counts.reshape(corpus.paper_count, len(FUNCTION_WORDS))
+    rates = fw_counts * 1000.0 / np.maximum(word_tokens, 1)[:, None]
+    for i, word in enumerate(FUNCTION_WORDS):
+        columns[f"'{word}' per 1000 words"] = np.round(rates[:, i], 3)
+
+    order = np.argsort(columns['Paper Number'], kind='stable')
+    return {name: values[order] for name, values in columns.items()}
+
+def write_statistics(columns: Dict[str, np.ndarray], csv_path: str = CSV_PATH,
+                     columns_path: str = COLUMNS_PATH):
+    """Write the columns to a CSV file and to a columnar .npz file."""
+    names = list(columns)
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(zip(*(columns[name].tolist() for name in names)))
+
+    # np.savez appends .npz to paths without it, so write through a file object
+    tmp_path = columns_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, names=np.array(names, dtype=str),
+                 **{f'column_{i}': columns[name] for i, name in enumerate(names)})
+    os.replace(tmp_path, columns_path)
+
+def load_columns(columns_path: str = COLUMNS_PATH) -> Dict[str, np.ndarray]:
+    """Read the columnar statistics file back into {header: array}."""
+    with np.load(columns_path, allow_pickle=False) as data:
+        names = data['names'].tolist()
+        return {name: data[f'column_{i}'] for i, name in enumerate(names)}
+
+def load_statistics(csv_path: str = CSV_PATH, columns_path: str = COLUMNS_PATH):
+    """
+    Return the statistics as a pandas DataFrame, from the columnar file when
+    it is at least as new as the CSV and from the CSV otherwise.
+    """
+    import pandas as pd
+    try:
+        columnar_mtime = os.stat(columns_path).st_mtime_ns
+    except FileNotFoundError:
+        columnar_mtime = None
+    try:
+        csv_mtime = os.stat(csv_path).st_mtime_ns
+    except FileNotFoundError:
+        csv_mtime = None
+
+    if columnar_mtime is not None and (csv_mtime is None or columnar_mtime >= csv_mtime):
+        return pd.DataFrame(load_columns(columns_path))
+    return pd.read_csv(csv_path)
@@ -0,0 +1,66 @@
+import re
+from typing import List, Tuple
+
+# A sentence ends at . ! or ? (plus closing quotes/brackets) followed by whitespace
+SENTENCE_END = re.compile(r'[.!?]["\')\]]*\s+')
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """Return (start, end) spans of the sentences of text, paragraph breaks included."""
+    breaks = {match.end() for match in SENTENCE_END.finditer(text)}
+    breaks.update(match.end() for match in PARAGRAPH_BREAK.finditer(text))
+    spans = []
+    start = 0
+    for end in sorted(breaks) + [len(text)]:
+        span = _strip_span(text, start, end)
+        if span:
+            spans.append(span)
+        start = end
+    return spans
+
+def _strip_span(text: str, start: int, end: int):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+def _split_long_span(text: str, start: int, end: int, max_chars: int) -> List[Tuple[int, int]]:
+    """Split a span longer than max_chars at whitespace."""
+    spans = []
+    while end - start > max_chars:
+        cut = text.rfind(' ', start + 1, start + max_chars + 1)
+        if cut <= start:
+            cut = start + max_chars
+        spans.append(_strip_span(text, start, cut))
+        start = cut
+    last = _strip_span(text, start, end)
+    if last:
+        spans.append(last)
+    return [span for span in spans if span]
+
+def chunk_spans(text: str, max_chars: int) -> List[Tuple[int, int]]:
+    """
+    Group whole sentences into (start, end) windows of at most max_chars
+    characters. Only a sentence longer than max_chars is split mid-sentence.
+    """
+    chunks = []
+    current = None
+    for start, end in sentence_spans(text):
+        if current is not None and end - current[0] <= max_chars:
+            current = (current[0], end)
+            continue
+        if current is not None:
+            chunks.append(current)
+            current = None
+        if end - start > max_chars:
+            chunks.extend(_split_long_span(text, start, end, max_chars))
+        else:
+            current = (start, end)
+    if current is not None:
+        chunks.append(current)
+    return chunks
+
+def chunk_text(text: str, max_chars: int) -> List[str]:
+    """Split text into sentence-aligned chunks of at most max_chars characters."""
+    return [text[start:end] for start, end in chunk_spans(text, max_chars)]
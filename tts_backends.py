@@ -0,0 +1,109 @@
+"""
+Local text-to-speech engines that write WAV files.
+
+Every backend runs offline on the CPU:
+    piper    - neural voices; needs the piper binary and a .onnx voice
+               (--voice or the PIPER_VOICE environment variable)
+    espeak   - espeak-ng or espeak; small and always intelligible
+    pyttsx3  - the platform speech engine through the pyttsx3 package
+
+get_backend() returns the named backend, or the first one available in
+that order.
+"""
+import os
+import shutil
+import subprocess
+from abc import ABC, abstractmethod
+from importlib.util import find_spec
+from typing import Dict, Optional, Type
+
+class TTSBackend(ABC):
+    """Synthesizes one piece of text into a WAV file."""
+
+    name = ''
+    # False when the engine cannot synthesize from several threads at once
+    parallel = True
+
+    def __init__(self, voice: Optional[str] = None):
+        self.voice = voice
+
+    @abstractmethod
+    def available(self) -> bool:
+        """Whether the engine (and its voice) is installed."""
+
+    def cache_key(self) -> str:
+        """Identifies the engine and voice, so cached audio is redone when either changes."""
+        return f"{self.name}:{self.voice or ''}"
+
+    @abstractmethod
+    def synthesize(self, text: str, wav_path: str):
+        """Write text spoken by the engine to wav_path."""
+
+class PiperBackend(TTSBackend):
+    name = 'piper'
+
+    def __init__(self, voice: Optional[str] = None):
+        super().__init__(voice or os.environ.get('PIPER_VOICE'))
+        self.command = shutil.which('piper')
+
+    def available(self) -> bool:
+        return self.command is not None and bool(self.voice) and os.path.exists(self.voice)
+
+    def synthesize(self, text: str, wav_path: str):
+        subprocess.run([self.command, '--model', self.voice, '--output_file', wav_path],
+                       input=text, text=True, capture_output=True, check=True)
+
+class EspeakBackend(TTSBackend):
+    name = 'espeak'
+    RATE = 160  # words per minute
+
+    def __init__(self, voice: Optional[str] = None):
+        super().__init__(voice)
+        self.command = shutil.which('espeak-ng') or shutil.which('espeak')
+
+    def available(self) -> bool:
+        return self.command is not None
+
+    def synthesize(self, text: str, wav_path: str):
+        command = [self.command, '-w', wav_path, '-s', str(self.RATE), '--stdin']
+        if self.voice:
+            command[1:1] = ['-v', self.voice]
+        subprocess.run(command, input=text, text=True, capture_output=True, check=True)
+
+class Pyttsx3Backend(TTSBackend):
+    name = 'pyttsx3'
+    parallel = False
+
+    def available(self) -> bool:
+        return find_spec('pyttsx3') is not None
+
+    def synthesize(self, text: str, wav_path: str):
+        import pyttsx3
+        engine = pyttsx3.init()
+        if self.voice:
+            engine.setProperty('voice', self.voice)
+        engine.save_to_file(text, wav_path)
+        engine.runAndWait()
+
+BACKENDS: Dict[str, Type[TTSBackend]] = {
+    'piper': PiperBackend,
+    'espeak': EspeakBackend,
+    'pyttsx3': Pyttsx3Backend,
+}
+
+def get_backend(name: Optional[str] = None, voice: Optional[str] = None) -> TTSBackend:
+    """
+    Return the named backend, or the first available one. Raises
+    RuntimeError if it is not installed.
+    """
+    if name is not None:
+        backend = BACKENDS[name](voice)
+        if not backend.available():
+            raise RuntimeError(f"TTS backend '{name}' is not installed")
+        return backend
+
+    for backend_class in BACKENDS.values():
+        backend = backend_class(voice)
+        if backend.available():
+            return backend
+    raise RuntimeError("No TTS backend found. Install espeak-ng, piper (with a voice) or pyttsx3.")
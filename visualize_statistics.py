@@ -5,6 +5,7 @@ from tabulate import tabulate
 import numpy as np
 import sys
 import os
+from stats_engine import COLUMNS_PATH, CSV_PATH, load_statistics
 
 def create_distribution_table(data, column, bins=10):
     """Create a frequency distribution table for the given column"""
@@ -29,13 +30,13 @@ def create_distribution_table(data, column, bins=10):
 
 def plot_distributions():
     # Check if statistics file exists
-    if not os.path.exists('statistics.csv'):
-        print("Error: statistics.csv not found. Please run generate_statistics.py first.")
+    if not os.path.exists(CSV_PATH) and not os.path.exists(COLUMNS_PATH):
+        print(f"Error: {CSV_PATH} not found. Please run generate_statistics.py first.")
         sys.exit(1)
     
     try:
         # Read the statistics
-        df = pd.read_csv('statistics.csv')
+        df = load_statistics()
         
         # Set style
         plt.style.use('default')
@@ -1,8 +1,12 @@
 import re
 from collections import Counter
+import csv
 import json
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 import argparse
+import sys
+import numpy as np
+from doc_term_matrix import get_matrix
 
 # Common English stop words to exclude
 STOP_WORDS = {
@@ -78,6 +82,12 @@ def print_top_words(word_counts: Dict[str, int], top_n: int = 50):
     total_words = sum(count for word, count in word_counts.items() 
                      if word != '__total_unique_words__')
     
+    top_words = [(k, v) for k, v in word_counts.items() if k != '__total_unique_words__'][:top_n]
+    print_top_table(top_words, total_unique, filtered_unique, total_words, top_n)
+
+def print_top_table(top_words: List[Tuple[str, int]], total_unique: int, filtered_unique: int,
+                    total_words: int, top_n: int):
+    """Print the summary counts and the table of top words with percentages."""
     print(f"\nTotal unique words (before filtering): {total_unique}")
     print(f"Unique words (after removing stop words): {filtered_unique}")
     print(f"Total content words: {total_words}")
@@ -86,16 +96,129 @@ def print_top_words(word_counts: Dict[str, int], top_n: int = 50):
     print("Word               Count     % of Total")
     print("-" * 45)
     
-    for i, (word, count) in enumerate(
-        [(k, v) for k, v in word_counts.items() if k != '__total_unique_words__'][:top_n], 
-        1
-    ):
+    for word, count in top_words:
         percentage = (count / total_words) * 100
         print(f"{word:<18} {count:>5}     {percentage:>6.2f}%")
 
+def print_corpus_top_words(json_file: str, numbers: Optional[List[int]], author: Optional[str],
+                           min_length: int = 3, top_n: int = 50):
+    """Print the top N words of some papers, an author or the whole corpus from the cached matrix."""
+    matrix = get_matrix(json_file)
+    rows = matrix.rows_for(numbers, author)
+    if not rows:
+        print("Error: no papers match the selection.")
+        sys.exit(1)
+    
+    counts = matrix.counts(None if numbers is None and author is None else rows)
+    mask = matrix.content_mask(STOP_WORDS, min_length)
+    content_counts = np.where(mask, counts, 0)
+    
+    print(f"Analyzing {len(rows)} papers from {json_file}")
+    print_top_table(matrix.top_words(content_counts, top_n),
+                    total_unique=int(np.count_nonzero(counts)),
+                    filtered_unique=int(np.count_nonzero(content_counts)),
+                    total_words=int(content_counts.sum()),
+                    top_n=top_n)
+
+def log_likelihood_scores(counts: np.ndarray) -> np.ndarray:
+    """
+    Signed log-likelihood (G2) of each word in each group against all other
+    groups combined; positive where the group uses the word more than the rest.
+    """
+    group_totals = counts.sum(axis=1, keepdims=True).astype(float)
+    word_totals = counts.sum(axis=0, keepdims=True).astype(float)
+    other = word_totals - counts
+    other_totals = group_totals.sum() - group_totals
+    expected = word_totals * group_totals / max(group_totals.sum(), 1)
+    expected_other = word_totals * other_totals / max(group_totals.sum(), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        g2 = 2 * (np.where(counts > 0, counts * np.log(counts / expected), 0)
+                  + np.where(other > 0, other * np.log(other / expected_other), 0))
+        overused = counts / np.maximum(group_totals, 1) >= other / np.maximum(other_totals, 1)
+    return np.where(overused, g2, -g2)
+
+def tfidf_scores(counts: np.ndarray) -> np.ndarray:
+    """Term frequency within each group times the log inverse fraction of groups using the word."""
+    tf = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+    df = np.count_nonzero(counts, axis=0)
+    idf = np.log(len(counts) / np.maximum(df, 1))
+    return tf * idf
+
+SCORERS = {'llr': log_likelihood_scores, 'tfidf': tfidf_scores}
+
+def group_frequency_tables(json_file: str, by: str, score: str = 'llr', min_length: int = 3,
+                           top_n: int = 50) -> Dict[str, dict]:
+    """
+    Word frequency tables of every author, paper or tag at once, with the
+    top_n most distinctive words of each group by the chosen score.
+    """
+    matrix = get_matrix(json_file)
+    groups = matrix.groups(by)
+    mask = matrix.content_mask(STOP_WORDS, min_length)
+    counts = matrix.group_counts(groups) * mask
+    scores = SCORERS[score](counts)
+    
+    # Only words a group actually uses can be distinctive for it
+    ranked = np.where(counts > 0, scores, -np.inf)
+    top_n = min(top_n, counts.shape[1])
+    top = np.argpartition(-ranked, top_n - 1, axis=1)[:, :top_n] if top_n > 0 else np.zeros((len(groups), 0), int)
+    
+    tables = {}
+    for i, (name, rows) in enumerate(groups.items()):
+        total = int(counts[i].sum())
+        words = sorted(top[i], key=lambda w: (-ranked[i, w], str(matrix.vocab[w])))
+        tables[name] = {
+            'papers': [matrix.numbers[row] for row in rows],
+            'total_words': total,
+            'unique_words': int(np.count_nonzero(counts[i])),
+            'words': [{
+                'word': str(matrix.vocab[w]),
+                'count': int(counts[i, w]),
+                'percentage': round(counts[i, w] / total * 100, 4) if total else 0.0,
+                'score': round(float(scores[i, w]), 6)
+            } for w in words if counts[i, w] > 0]
+        }
+    return tables
+
+def save_group_tables(tables: Dict[str, dict], by: str, score: str, output_file: str):
+    """Save the group tables as one JSON document, or as CSV rows if output_file ends in .csv."""
+    if output_file.lower().endswith('.csv'):
+        with open(output_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([by, 'rank', 'word', 'count', 'percentage', score])
+            for name, table in tables.items():
+                for rank, entry in enumerate(table['words'], 1):
+                    writer.writerow([name, rank, entry['word'], entry['count'],
+                                     entry['percentage'], entry['score']])
+    else:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump({'by': by, 'score': score, 'groups': tables}, f, indent=2)
+
+def print_group_tables(tables: Dict[str, dict], by: str, top_n: int = 10):
+    """Print the most distinctive words of each group on one line."""
+    print(f"\nMost distinctive words by {by}:")
+    print("-" * 45)
+    for name, table in tables.items():
+        words = ', '.join(entry['word'] for entry in table['words'][:top_n])
+        print(f"{name} ({len(table['papers'])} papers, {table['total_words']} words): {words}")
+
 def main():
-    parser = argparse.ArgumentParser(description='Analyze word frequencies in a text file.')
-    parser.add_argument('file', help='Path to the text file to analyze')
+    parser = argparse.ArgumentParser(description='Analyze word frequencies in a text file or in the corpus.')
+    parser.add_argument('file', nargs='?', help='Path to the text file to analyze')
+    parser.add_argument('--paper', type=int, nargs='+',
+                       help='Analyze these paper numbers from the corpus instead of a file')
+    parser.add_argument('--author',
+                       help='Analyze every paper by this author from the corpus instead of a file')
+    parser.add_argument('--corpus', action='store_true',
+                       help='Analyze the whole corpus instead of a file')
+    parser.add_argument('--by', choices=['author', 'paper', 'tag'],
+                       help='Build the word frequency table of every author, paper or tag from the corpus')
+    parser.add_argument('--score', choices=sorted(SCORERS), default='llr',
+                       help='Distinctiveness score used with --by: log-likelihood or TF-IDF (default: llr)')
+    parser.add_argument('--output',
+                       help='File for the --by tables, JSON or .csv (default: word_frequencies_by_<by>.json)')
+    parser.add_argument('--json', default='fp_tagged.json',
+                       help='Corpus JSON file used by --by, --paper, --author and --corpus (default: fp_tagged.json)')
     parser.add_argument('--min-length', type=int, default=3, 
                        help='Minimum word length to include (default: 3)')
     parser.add_argument('--top', type=int, default=50,
@@ -105,6 +228,26 @@ def main():
     
     args = parser.parse_args()
     
+    if args.by:
+        try:
+            tables = group_frequency_tables(args.json, args.by, args.score, args.min_length, args.top)
+        except FileNotFoundError:
+            print(f"Error: File '{args.json}' not found.")
+            return
+        print_group_tables(tables, args.by)
+        output_file = args.output or f"word_frequencies_by_{args.by}.json"
+        save_group_tables(tables, args.by, args.score, output_file)
+        print(f"\nFrequency tables for {len(tables)} groups saved to: {output_file}")
+        return
+    if args.paper or args.author or args.corpus:
+        try:
+            print_corpus_top_words(args.json, args.paper, args.author, args.min_length, args.top)
+        except FileNotFoundError:
+            print(f"Error: File '{args.json}' not found.")
+        return
+    if args.file is None:
+        parser.error('give a file to analyze, or one of --by, --paper, --author or --corpus')
+    
     try:
         # Read the file
         with open(args.file, 'r', encoding='utf-8') as f: